@@ -3,4 +3,4 @@ from flask import Blueprint
 bp = Blueprint('api', __name__)
 
 # Import routes
-from app.api import members, tournaments, scores, dashboard, reports, awards
+from app.api import members, tournaments, scores, dashboard, reports, awards, jobs
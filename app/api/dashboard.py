@@ -1,6 +1,6 @@
 from flask import Blueprint, jsonify, current_app, request
 from app.models import Member, Tournament, YearlyChampion, db, Announcement, SystemConfig
-from datetime import datetime
+from datetime import datetime, date
 from sqlalchemy import func
 import traceback
 from app.api import bp
@@ -22,8 +22,10 @@ def get_dashboard_stats():
 
         # 獲取本年度的賽事
         current_year = datetime.now().year
+        # 以日期範圍篩選才能使用 tournament.date 索引
         tournaments = Tournament.query.filter(
-            func.extract('year', Tournament.date) == current_year
+            Tournament.date >= date(current_year, 1, 1),
+            Tournament.date < date(current_year + 1, 1, 1)
         ).order_by(Tournament.date.desc()).all()
 
         # 計算本年度賽事總數
@@ -0,0 +1,23 @@
+from flask import jsonify, current_app
+from app.api import bp
+from app.models import ImportJob
+from app.jobs import expire_stale_jobs, DEFAULT_STALE_AFTER
+import traceback
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查詢背景匯入工作的進度與結果"""
+    try:
+        # 執行行程已停止的工作不會再更新，讀取時先標記為失敗，避免用戶端無限輪詢
+        expire_stale_jobs([job_id], current_app.config.get('IMPORT_JOB_STALE_AFTER', DEFAULT_STALE_AFTER))
+        job = ImportJob.query.get(job_id)
+        if not job:
+            return jsonify({'error': f'找不到匯入工作 {job_id}'}), 404
+        return jsonify(job.to_dict())
+    except Exception as e:
+        current_app.logger.error(f"獲取匯入工作狀態失敗: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({
+            'error': '獲取匯入工作狀態失敗',
+            'details': str(e)
+        }), 500
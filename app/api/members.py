@@ -2,67 +2,69 @@ from flask import Blueprint, jsonify, request, current_app
 from app.models import Member, db
 
 bp = Blueprint('members', __name__)
-from werkzeug.utils import secure_filename
 import pandas as pd
-import os
 from app import db
-from app.models import Member, MemberVersion
+from app.models import Member, MemberVersion, MemberVersionCatalog
+from app.member_versions import (generate_version_number, refresh_version_catalog, add_versions,
+                                 version_states, member_history, diff_versions,
+                                 delete_version as delete_member_version)
 from app.api import bp
+from app.uploads import UploadedFile, MEMBER_UPLOAD_KIND, find_duplicate_upload, record_upload
+from app.jobs import wants_async, enqueue_import
+from app.serializers import member_list_serializer, FieldSetError
+from app.pagination import MAX_PAGE_SIZE
 import logging
 import traceback
 from datetime import datetime
-from sqlalchemy import func
-from sqlalchemy import Boolean
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def ensure_upload_dir():
-    upload_dir = current_app.config['UPLOAD_FOLDER']
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
-    return upload_dir
+# 名冊上傳會寫入 Member 的欄位
+ROSTER_FIELDS = ('account', 'chinese_name', 'english_name', 'department_class',
+                 'member_number', 'is_guest', 'is_admin', 'handicap')
 
-def generate_version_number():
-    """生成新的版本號"""
-    try:
-        # 獲取最新版本號
-        latest_version = db.session.query(MemberVersion.version)\
-            .order_by(MemberVersion.version.desc())\
-            .first()
-        
-        if latest_version:
-            current_version = latest_version[0]
-        else:
-            # 如果沒有任何版本，從202501060001開始
-            current_date = datetime.now().strftime('%Y%m%d')
-            current_version = int(f"{current_date}0001")
-            
-        # 生成新版本號
-        date_part = str(current_version)[:8]  # 取出日期部分
-        current_date = datetime.now().strftime('%Y%m%d')
-        
-        if date_part == current_date:
-            # 如果是同一天，序號加1
-            sequence = int(str(current_version)[8:]) + 1
-        else:
-            # 如果是新的一天，序號重置為1
-            sequence = 1
-            
-        new_version = int(f"{current_date}{sequence:04d}")
-        logger.info(f'Generated new version number: {new_version} (current: {current_version})')
-        return new_version
-        
-    except Exception as e:
-        logger.error(f'Error generating version number: {str(e)}')
-        logger.error(traceback.format_exc())
-        raise
-
-def process_excel_data(df):
+def write_roster(records, version_number):
+    """
+    以集合方式寫入名冊：一次查詢取出既有會員並在記憶體中比對，
+    新會員、有異動的會員與版本記錄各以一次批次寫入
+    """
+    numbers = [record['member_number'] for record in records]
+    existing = {
+        row.member_number: row for row in db.session.query(
+            Member.id, *(getattr(Member, field) for field in ROSTER_FIELDS)
+        ).filter(Member.member_number.in_(numbers))
+    }
+
+    now = datetime.utcnow()
+    inserts, updates = [], []
+    for record in records:
+        current = existing.get(record['member_number'])
+        if current is None:
+            inserts.append(dict(record))
+        elif any(getattr(current, field) != record[field] for field in ROSTER_FIELDS):
+            updates.append(dict(record, id=current.id, updated_at=now))
+
+    if inserts:
+        db.session.bulk_insert_mappings(Member, inserts)
+    if updates:
+        db.session.bulk_update_mappings(Member, updates)
+
+    ids = {number: row.id for number, row in existing.items()}
+    if inserts:
+        ids.update(db.session.query(Member.member_number, Member.id)
+                   .filter(Member.member_number.in_([record['member_number'] for record in inserts])))
+
+    add_versions(version_number, [(ids[record['member_number']], record) for record in records], created_at=now)
+    logger.info(f'Roster version {version_number}: {len(inserts)} new, {len(updates)} updated, '
+                f'{len(records) - len(inserts) - len(updates)} unchanged')
+
+def process_excel_data(df, upload=None):
     """
     處理 Excel 資料並創建新版本
     每次上傳都會創建新版本，不會覆蓋原有資料
+    提供 upload 時，會在同一個交易中記錄上傳內容與產生的版本
     """
     success_count = 0
     error_messages = []
@@ -81,18 +83,12 @@ def process_excel_data(df):
             logger.error('Duplicate member numbers found')
             return 0, ['Excel 檔案中包含重複的會員編號']
 
-        # 第二步：開始資料庫事務
-        version_number = generate_version_number()
-        logger.info(f'Starting transaction with version: {version_number}')
-        
-        # 第三步：處理每一行資料
-        new_members = []
-        version_records = []
+        # 第二步：驗證每一行資料
+        records = []
         row_errors = []
-        
-        for index, row in df.iterrows():
+
+        for index, row in enumerate(df.to_dict('records')):
             try:
-                logger.info(f'Processing row {index + 1}')
                 member_data = {
                     'account': str(row['帳號']).strip(),
                     'chinese_name': str(row['中文姓名']).strip(),
@@ -111,54 +107,26 @@ def process_excel_data(df):
                     row_errors.append(error_msg)
                     continue
 
-                # 查找或創建會員記錄
-                member = Member.query.filter_by(member_number=member_data['member_number']).first()
-                if not member:
-                    logger.info(f'Creating new member: {member_data["member_number"]}')
-                    member = Member(
-                        account=member_data['account'],
-                        chinese_name=member_data['chinese_name'],
-                        english_name=member_data['english_name'],
-                        department_class=member_data['department_class'],
-                        member_number=member_data['member_number'],
-                        is_guest=member_data['is_guest'],
-                        is_admin=member_data['is_admin'],
-                        handicap=member_data['handicap']
-                    )
-                    new_members.append(member)
-                    db.session.add(member)
-                    db.session.flush()  # 獲取 member.id
-                else:
-                    logger.info(f'Updating existing member: {member_data["member_number"]}')
-                    # 更新現有會員資料
-                    for key, value in member_data.items():
-                        setattr(member, key, value)
-
-                # 創建版本記錄
-                version = MemberVersion(
-                    member_id=member.id,
-                    version=version_number,
-                    data=member_data,
-                    created_at=datetime.now()
-                )
-                version_records.append(version)
-                success_count += 1
-                logger.info(f'Successfully processed member: {member_data["member_number"]}')
-                
+                records.append(member_data)
             except Exception as e:
                 error_msg = f"第 {index + 2} 行資料驗證失敗: {str(e)}"
                 logger.error(error_msg)
-                logger.error(traceback.format_exc())
                 row_errors.append(error_msg)
 
-        # 如果有成功處理的資料，就提交
+        success_count = len(records)
+
+        # 第三步：如果有成功處理的資料，取得版本號後寫入並提交
+        # 版本號計數器在提交前保持鎖定，因此驗證完成後才取號
         if success_count > 0:
-            logger.info(f'Committing {success_count} members to version {version_number}')
             try:
-                # 批次添加版本記錄
-                for version in version_records:
-                    db.session.add(version)
-                    logger.info(f'Adding version record for member {version.member_id}')
+                version_number = generate_version_number()
+                logger.info(f'Committing {success_count} members to version {version_number}')
+                write_roster(records, version_number)
+
+                # 有資料行失敗時不記錄，相同檔案再次上傳會重新驗證並回報錯誤，不會被當成重複上傳
+                if upload is not None and not row_errors:
+                    record_upload(MEMBER_UPLOAD_KIND, upload, success_count, member_version=version_number)
+                refresh_version_catalog([version_number])
 
                 # 提交所有更改
                 db.session.commit()
@@ -203,6 +171,10 @@ def get_members():
     try:
         # 從查詢參數中獲取版本號，如果沒有指定則使用最新版本
         version = request.args.get('version')
+        try:
+            fields = member_list_serializer.parse_fields(request.args.get('fields'))
+        except FieldSetError as e:
+            return jsonify({'error': str(e)}), 400
         
         # 獲取最新版本號
         latest_version = db.session.query(MemberVersion.version)\
@@ -217,36 +189,21 @@ def get_members():
             
         logger.info(f'Fetching members for version: {version}')
         
-        # 使用指定版本號獲取會員資料
-        members_data = db.session.query(
-            Member,
-            MemberVersion.data
-        ).join(
-            MemberVersion,
-            Member.id == MemberVersion.member_id
-        ).filter(
-            MemberVersion.version == version
-        ).all()
-
-        # 整理會員資料
-        result = []
-        for member, version_data in members_data:
-            try:
-                member_dict = {
-                    'id': member.id,
-                    'account': member.account,
-                    'chinese_name': member.chinese_name,
-                    'english_name': member.english_name,
-                    'department_class': member.department_class,
-                    'member_number': member.member_number,
-                    'is_guest': member.is_guest,
-                    'is_admin': member.is_admin,
-                    'handicap': float(version_data.get('handicap')) if version_data and version_data.get('handicap') is not None else None
-                }
-                result.append(member_dict)
-            except Exception as e:
-                logger.error(f'Error processing member {member.id}: {str(e)}')
-                continue
+        # 使用指定版本號獲取會員資料，只查詢需要的欄位
+        select_names = member_list_serializer.select_names(fields, ('member_id',) if 'handicap' in fields else ())
+        row_to_dict = member_list_serializer.compile(select_names, fields)
+        rows = db.session.query(*member_list_serializer.columns(select_names))\
+            .select_from(Member)\
+            .join(MemberVersion, Member.id == MemberVersion.member_id)\
+            .filter(MemberVersion.version == version)\
+            .all()
+        result = [row_to_dict(row) for row in rows]
+        if 'handicap' in fields:
+            # 只重建這次取出的會員
+            states = version_states(version, [row.member_id for row in rows])
+            for item, row in zip(result, rows):
+                data = states.get(row.member_id)
+                item['handicap'] = float(data['handicap']) if data and data.get('handicap') is not None else None
 
         logger.info(f'Found {len(result)} members for version {version}')
         return jsonify(result)
@@ -256,6 +213,71 @@ def get_members():
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+def run_member_upload(upload, progress=None):
+    """
+    處理會員名冊上傳，回傳 (payload, status_code)
+    不依賴請求物件，可在背景工作中執行
+    """
+    try:
+        # 與最近一次名冊上傳內容相同，且該版本仍是最新版本時，直接回傳既有版本
+        previous = find_duplicate_upload(MEMBER_UPLOAD_KIND, upload.content_hash)
+        if previous:
+            latest_version = db.session.query(MemberVersion.version)\
+                .order_by(MemberVersion.version.desc())\
+                .first()
+            if latest_version and str(latest_version[0]) == previous.member_version:
+                logger.info(f'Duplicate roster upload, returning existing version {previous.member_version}')
+                return {
+                    'success_count': previous.row_count,
+                    'error_messages': [],
+                    'version': previous.member_version,
+                    'duplicate': True
+                }, 200
+
+        logger.info('Reading Excel file')
+        df = upload.read_frame()
+        logger.info(f'Excel columns: {df.columns.tolist()}')
+        if progress:
+            progress(0, len(df))
+        
+        # 處理列名映射
+        df = df.rename(columns={
+            '會員/來賓': '會員類型',
+            '最新差點': '差點'
+        })
+        
+        # Validate required columns
+        required_columns = ['帳號', '中文姓名', '會員編號', '會員類型', '是否為管理員']
+        missing_columns = [col for col in required_columns if col not in df.columns]
+        if missing_columns:
+            logger.error(f'Missing columns: {missing_columns}')
+            logger.error(f'Excel columns: {df.columns.tolist()}')
+            return {
+                'error': f'Missing columns: {", ".join(missing_columns)}',
+                'required': required_columns,
+                'provided': df.columns.tolist()
+            }, 400
+
+        success_count, error_messages = process_excel_data(df, upload)
+        if progress:
+            progress(len(df), len(df))
+        
+        response = {
+            'success_count': success_count,
+            'error_messages': error_messages
+        }
+        
+        if error_messages:
+            response['error'] = '部分資料處理失敗，請檢查錯誤訊息'
+            return response, 400
+            
+        return response, 200
+        
+    except Exception as e:
+        logger.error(f'Error processing Excel file: {str(e)}')
+        logger.error(traceback.format_exc())
+        return {'error': f'Error processing file: {str(e)}'}, 400
+
 @bp.route('/members/upload', methods=['POST'])
 def upload_members():
     logger.info('File upload request received')
@@ -278,61 +300,15 @@ def upload_members():
             logger.error('Invalid file type')
             return jsonify({'error': 'Only .xlsx files are allowed'}), 400
 
-        # Ensure upload directory exists
-        upload_dir = ensure_upload_dir()
-        
-        try:
-            # Save file temporarily
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(upload_dir, filename)
-            logger.info(f'Saving file to {filepath}')
-            file.save(filepath)
-
-            # Read Excel file
-            logger.info('Reading Excel file')
-            df = pd.read_excel(filepath)
-            logger.info(f'Excel columns: {df.columns.tolist()}')
-            
-            # Remove temporary file
-            os.remove(filepath)
-            
-            # 處理列名映射
-            df = df.rename(columns={
-                '會員/來賓': '會員類型',
-                '最新差點': '差點'
-            })
-            
-            # Validate required columns
-            required_columns = ['帳號', '中文姓名', '會員編號', '會員類型', '是否為管理員']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                logger.error(f'Missing columns: {missing_columns}')
-                logger.error(f'Excel columns: {df.columns.tolist()}')
-                return jsonify({
-                    'error': f'Missing columns: {", ".join(missing_columns)}',
-                    'required': required_columns,
-                    'provided': df.columns.tolist()
-                }), 400
+        # Read Excel file straight from the request stream
+        upload = UploadedFile(file)
+        if wants_async(request.values):
+            job = enqueue_import('member_upload', upload, run_member_upload)
+            return jsonify(job.to_dict()), 202
 
-            success_count, error_messages = process_excel_data(df)
-            
-            response = {
-                'success_count': success_count,
-                'error_messages': error_messages
-            }
-            
-            if error_messages:
-                response['error'] = '部分資料處理失敗，請檢查錯誤訊息'
-                return jsonify(response), 400
-                
-            return jsonify(response), 200
-            
-        except Exception as e:
-            logger.error(f'Error processing Excel file: {str(e)}')
-            logger.error(traceback.format_exc())
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            return jsonify({'error': f'Error processing file: {str(e)}'}), 400
+        with upload:
+            payload, status_code = run_member_upload(upload)
+        return jsonify(payload), status_code
             
     except Exception as e:
         logger.error(f'Unexpected error: {str(e)}')
@@ -390,15 +366,12 @@ def create_member():
             handicap=data.get('handicap')
         )
         db.session.add(member)
+        db.session.flush()
         
         # Create initial version
-        version = MemberVersion(
-            member=member,
-            version=generate_version_number(),
-            data=data,
-            created_at=datetime.now()
-        )
-        db.session.add(version)
+        version_number = generate_version_number()
+        add_versions(version_number, [(member.id, data)])
+        refresh_version_catalog([version_number])
         
         db.session.commit()
         logger.info(f'Member created: {member.id}')
@@ -486,13 +459,8 @@ def update_member(member_id):
                 logger.info(f'Generated version number: {version_number}')
                 logger.info(f'Version data: {version_data}')
                 
-                version = MemberVersion(
-                    member=member,
-                    version=version_number,
-                    data=version_data,
-                    created_at=datetime.now()
-                )
-                db.session.add(version)
+                add_versions(version_number, [(member.id, version_data)])
+                refresh_version_catalog([version_number])
                 
                 logger.info('Committing changes to database')
                 db.session.commit()
@@ -533,85 +501,58 @@ def delete_member(id):
 @bp.route('/members/versions/<int:id>', methods=['GET'])
 def get_member_versions(id):
     logger.info(f'Get member versions request received for member {id}')
-    versions = MemberVersion.query.filter_by(member_id=id).order_by(
-        MemberVersion.version.desc()).all()
+    history = member_history(id)
     return jsonify([{
         'version': v.version,
-        'data': v.data,
+        'data': data,
         'created_at': v.created_at
-    } for v in versions])
+    } for v, data in reversed(history)])
 
 @bp.route('/members/compare', methods=['POST'])
 def compare_versions():
-    """比較兩個版本的差異"""
+    """
+    比較兩個版本的差異（可為任兩個版本，不限相鄰）
+    指定 limit 或 offset 時分頁回傳 {items, total, field_counts, limit, offset}，否則回傳所有差異
+    """
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         from_version = data.get('from')  # 舊版本
         to_version = data.get('to')      # 新版本
 
         if not from_version or not to_version:
             return jsonify({'error': '請提供要比較的版本號'}), 400
 
-        # 獲取兩個版本的會員資料
-        old_data = db.session.query(
-            Member.member_number,
-            Member.chinese_name,
-            MemberVersion.data
-        ).join(
-            MemberVersion,
-            Member.id == MemberVersion.member_id
-        ).filter(
-            MemberVersion.version == from_version
-        ).all()
-
-        new_data = db.session.query(
-            Member.member_number,
-            Member.chinese_name,
-            MemberVersion.data
-        ).join(
-            MemberVersion,
-            Member.id == MemberVersion.member_id
-        ).filter(
-            MemberVersion.version == to_version
-        ).all()
-
-        # 將資料轉換為字典格式，方便比較
-        old_dict = {m.member_number: m.data for m in old_data}
-        new_dict = {m.member_number: m.data for m in new_data}
-
-        # 比較差異
-        differences = []
-        all_members = set(old_dict.keys()) | set(new_dict.keys())
-
-        for member_number in all_members:
-            old_member_data = old_dict.get(member_number, {})
-            new_member_data = new_dict.get(member_number, {})
-
-            # 比較所有欄位
-            for field in ['handicap', 'is_guest', 'is_admin', 'chinese_name', 'english_name', 'department_class']:
-                old_value = old_member_data.get(field)
-                new_value = new_member_data.get(field)
-
-                if old_value != new_value:
-                    # 找到對應的會員姓名
-                    member_name = next(
-                        (m.chinese_name for m in old_data if m.member_number == member_number),
-                        next(
-                            (m.chinese_name for m in new_data if m.member_number == member_number),
-                            None
-                        )
-                    )
-
-                    differences.append({
-                        'member_number': member_number,
-                        'name': member_name,
-                        'field': field,
-                        'old': old_value,
-                        'new': new_value
-                    })
-
-        logger.info(f'Found {len(differences)} differences between versions {from_version} and {to_version}')
-        return jsonify(differences)
+        # 分頁參數可放在 JSON 內容或查詢字串
+        options = dict(request.args.items())
+        options.update(data)
+        paginated = options.get('limit') not in (None, '') or options.get('offset') not in (None, '')
+        try:
+            limit = options.get('limit')
+            limit = int(limit) if limit not in (None, '') else MAX_PAGE_SIZE
+            offset = int(options.get('offset') or 0)
+            if limit < 1 or offset < 0:
+                raise ValueError('limit 必須大於 0，offset 不可為負數')
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': '分頁參數錯誤', 'details': str(e)}), 400
+        limit = min(limit, MAX_PAGE_SIZE)
+
+        missing = [str(v) for v in (from_version, to_version) if MemberVersionCatalog.query.get(str(v)) is None]
+        if missing:
+            return jsonify({'error': f'找不到版本 {", ".join(missing)}'}), 404
+
+        # 分頁時只保留這一頁的異動，總筆數與各欄位筆數在同一次掃描中累計
+        differences, field_counts, total = diff_versions(
+            from_version, to_version, offset=offset if paginated else 0, limit=limit if paginated else None)
+        logger.info(f'Found {total} differences between versions {from_version} and {to_version}')
+        if not paginated:
+            return jsonify(differences)
+        return jsonify({
+            'items': differences,
+            'total': total,
+            'field_counts': field_counts,
+            'limit': limit,
+            'offset': offset
+        })
 
     except Exception as e:
         logger.error(f'Error comparing versions: {str(e)}')
@@ -622,38 +563,12 @@ def compare_versions():
 def get_all_versions():
     """獲取所有版本列表"""
     try:
-        # 獲取所有不重複的版本號，按版本號降序排序
-        versions = db.session.query(MemberVersion.version)\
-            .distinct()\
-            .order_by(MemberVersion.version.desc())\
+        # 版本摘要在版本新增或刪除時維護，這裡只需讀取目錄
+        catalog = MemberVersionCatalog.query\
+            .order_by(MemberVersionCatalog.version.desc())\
             .all()
-        
-        # 獲取每個版本的會員數量
-        version_info = []
-        for (version,) in versions:
-            try:
-                # 計算該版本的會員數量
-                member_count = db.session.query(func.count(MemberVersion.id))\
-                    .filter(MemberVersion.version == version)\
-                    .scalar()
-                
-                # 獲取該版本的創建時間
-                created_at = db.session.query(MemberVersion.created_at)\
-                    .filter(MemberVersion.version == version)\
-                    .order_by(MemberVersion.created_at.asc())\
-                    .first()
-                
-                version_info.append({
-                    'version': str(version),
-                    'member_count': member_count,
-                    'created_at': created_at[0].isoformat() if created_at else None
-                })
-            except Exception as e:
-                logger.error(f'Error processing version {version}: {str(e)}')
-                continue
-        
-        logger.info(f'Found {len(version_info)} versions')
-        return jsonify(version_info)
+        logger.info(f'Found {len(catalog)} versions')
+        return jsonify([entry.to_dict() for entry in catalog])
         
     except Exception as e:
         logger.error(f'Error getting versions: {str(e)}')
@@ -675,14 +590,16 @@ def compare_member_versions():
             version=data['version2']
         ).first_or_404()
         
-        # Compare the two versions and return differences
+        # 重建兩個版本的完整資料後比較
+        data1 = version_states(version1.version, [version1.member_id])[version1.member_id]
+        data2 = version_states(version2.version, [version2.member_id])[version2.member_id]
         differences = {}
         fields = ['account', 'chinese_name', 'english_name', 'department_class',
                   'member_number', 'is_guest', 'is_admin', 'handicap']
                   
         for field in fields:
-            value1 = version1.data.get(field)
-            value2 = version2.data.get(field)
+            value1 = data1.get(field)
+            value2 = data2.get(field)
 
             if value1 != value2:
                 # 找到對應的會員姓名
@@ -747,9 +664,7 @@ def delete_version(version):
         
         # 執行刪除
         logger.info(f'開始執行刪除操作: {version_str}')
-        deleted_count = db.session.query(MemberVersion)\
-            .filter(MemberVersion.version == version_str)\
-            .delete()
+        deleted_count = delete_member_version(version_str)
             
         db.session.commit()
         logger.info(f'成功刪除版本 {version_str}，共刪除 {deleted_count} 筆記錄')
@@ -765,7 +680,8 @@ def delete_version(version):
 @bp.route('/members/clear', methods=['POST'])
 def clear_members():
     try:
-        # 先清除所有版本記錄
+        # 先清除所有版本記錄與版本目錄
+        MemberVersionCatalog.query.delete()
         MemberVersion.query.delete()
         # 再清除所有會員記錄
         Member.query.delete()
@@ -781,41 +697,16 @@ def clear_members():
 def get_member_count():
     """獲取最新版本的會員總數（不含來賓）"""
     try:
-        # 獲取最新版本號
-        latest_version_query = db.session.query(MemberVersion.version)\
-            .order_by(MemberVersion.version.desc())\
+        # 最新版本的非來賓人數已記錄在版本目錄中
+        latest = MemberVersionCatalog.query\
+            .order_by(MemberVersionCatalog.version.desc())\
             .first()
         
-        if not latest_version_query:
+        if not latest:
             logger.warning("No versions found")
             return jsonify({'count': 0})
         
-        latest_version = latest_version_query[0]    
-        logger.info(f"Latest version found: {latest_version}")
-        
-        # 先獲取最新版本的所有會員資料
-        members = db.session.query(Member)\
-            .join(MemberVersion, Member.id == MemberVersion.member_id)\
-            .filter(MemberVersion.version == latest_version)\
-            .all()
-        
-        # 手動過濾非來賓會員
-        non_guest_count = 0
-        for member in members:
-            # 獲取該會員在最新版本的資料
-            version_data = db.session.query(MemberVersion)\
-                .filter(
-                    MemberVersion.member_id == member.id,
-                    MemberVersion.version == latest_version
-                ).first()
-            
-            if version_data:
-                member_data = version_data.data
-                is_guest = member_data.get('is_guest', False)
-                if not is_guest:
-                    non_guest_count += 1
-                logger.debug(f"Member {member.id}: is_guest = {is_guest}")
-            
+        latest_version, non_guest_count = latest.version, latest.non_guest_count
         logger.info(f"Found {non_guest_count} non-guest members in version {latest_version}")
         return jsonify({'count': non_guest_count})
         
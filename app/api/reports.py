@@ -1,43 +1,177 @@
-from flask import jsonify
+from flask import jsonify, request, current_app
 from app.api import bp
-from app.models import Score, Tournament, Member
+from app.models import Score, Tournament, Member, db
+from app.stats import column_percentiles, handicap_series
+from app.cache import handicap_series_cache
+from datetime import datetime
 from sqlalchemy import func
+import traceback
+
+# 賽事摘要回傳的百分位數
+SUMMARY_PERCENTILES = (('p25', 0.25), ('median', 0.5), ('p75', 0.75))
+
+# 排行榜可用的排序方式：(欄位, 是否由大到小)
+LEADERBOARD_ORDERS = {
+    'net': (Score.net_score, False),
+    'gross': (Score.gross_score, False),
+    'points': (Score.points, True),
+}
+
+def _number(value, digits=2):
+    return round(float(value), digits) if value is not None else None
+
+def score_distribution(column, condition, mean, minimum, maximum):
+    """平均、最小、最大與百分位數"""
+    percentiles = column_percentiles(column, condition, [p for _, p in SUMMARY_PERCENTILES])
+    summary = {'mean': _number(mean), 'min': _number(minimum), 'max': _number(maximum)}
+    for (name, _), value in zip(SUMMARY_PERCENTILES, percentiles):
+        summary[name] = _number(value)
+    return summary
 
 @bp.route('/reports/tournament-summary/<int:tournament_id>', methods=['GET'])
 def tournament_summary(tournament_id):
     tournament = Tournament.query.get_or_404(tournament_id)
-    scores = Score.query.filter_by(tournament_id=tournament_id).all()
-    
-    summary = {
-        'tournament': tournament.to_dict(),
-        'total_players': len(scores),
-        'scores': [s.to_dict() for s in scores],
-        'average_score': sum(s.score for s in scores) / len(scores) if scores else 0
-    }
-    return jsonify(summary)
-
-@bp.route('/reports/member-history/<int:member_id>', methods=['GET'])
-def member_history(member_id):
-    member = Member.query.get_or_404(member_id)
-    scores = Score.query.filter_by(member_id=member_id).all()
-    
-    history = {
-        'member': member.to_dict(),
-        'total_tournaments': len(scores),
-        'scores': [s.to_dict() for s in scores],
-        'average_score': sum(s.score for s in scores) / len(scores) if scores else 0
-    }
-    return jsonify(history)
+    try:
+        condition = Score.tournament_id == tournament_id
+
+        # 參賽人數與總桿/淨桿的平均、最小、最大在同一個查詢中計算
+        totals = db.session.query(
+            func.count(Score.id),
+            func.avg(Score.gross_score), func.min(Score.gross_score), func.max(Score.gross_score),
+            func.avg(Score.net_score), func.min(Score.net_score), func.max(Score.net_score)
+        ).filter(condition).one()
+
+        return jsonify({
+            'tournament': tournament.to_dict(),
+            'total_players': totals[0],
+            'gross_score': score_distribution(Score.gross_score, condition, *totals[1:4]),
+            'net_score': score_distribution(Score.net_score, condition, *totals[4:7])
+        })
+    except Exception as e:
+        current_app.logger.error(f"產生賽事摘要時發生錯誤: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({'error': '產生賽事摘要失敗', 'details': str(e)}), 500
+
+@bp.route('/reports/member-history/<member_number>', methods=['GET'])
+def member_history(member_number):
+    try:
+        member = Member.query.filter_by(member_number=member_number).first()
+        condition = Score.member_number == member_number
+
+        totals = db.session.query(
+            func.count(Score.id),
+            func.avg(Score.gross_score),
+            func.avg(Score.net_score),
+            func.min(Score.gross_score),
+            func.coalesce(func.sum(Score.points), 0)
+        ).filter(condition).one()
+        if member is None and not totals[0]:
+            return jsonify({'error': f'找不到會員編號 {member_number}'}), 404
+
+        # 依賽事日期排列的歷次成績
+        rows = db.session.query(
+            Tournament.id, Tournament.name, Tournament.date,
+            Score.rank, Score.gross_score, Score.net_score, Score.new_handicap, Score.points
+        ).join(Tournament, Score.tournament_id == Tournament.id)\
+            .filter(condition)\
+            .order_by(Tournament.date, Score.id)\
+            .all()
+
+        return jsonify({
+            'member_number': member_number,
+            'member': member.to_dict() if member else None,
+            'total_tournaments': totals[0],
+            'average_gross_score': _number(totals[1]),
+            'average_net_score': _number(totals[2]),
+            'best_gross_score': totals[3],
+            'total_points': int(totals[4]),
+            'scores': [{
+                'tournament_id': tournament_id,
+                'tournament_name': name,
+                'date': date.strftime('%Y-%m-%d'),
+                'rank': rank,
+                'gross_score': gross_score,
+                'net_score': _number(net_score),
+                'new_handicap': _number(new_handicap),
+                'points': points
+            } for tournament_id, name, date, rank, gross_score, net_score, new_handicap, points in rows]
+        })
+    except Exception as e:
+        current_app.logger.error(f"產生會員歷史成績時發生錯誤: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({'error': '產生會員歷史成績失敗', 'details': str(e)}), 500
 
 @bp.route('/reports/leaderboard/<int:tournament_id>', methods=['GET'])
 def tournament_leaderboard(tournament_id):
-    scores = Score.query.filter_by(tournament_id=tournament_id)\
-        .order_by(Score.score).all()
-    
-    leaderboard = [{
-        'position': i + 1,
-        'member': s.member.to_dict(),
-        'score': s.score
-    } for i, s in enumerate(scores)]
-    
-    return jsonify(leaderboard)
+    order_by = request.args.get('by', 'net')
+    if order_by not in LEADERBOARD_ORDERS:
+        return jsonify({'error': f'不支援的排序方式: {order_by}'}), 400
+    Tournament.query.get_or_404(tournament_id)
+    try:
+        # 以視窗函式在資料庫中排名，同分同名次；該欄位沒有成績的不列入排行
+        column, descending = LEADERBOARD_ORDERS[order_by]
+        order = column.desc() if descending else column.asc()
+        position = func.rank().over(order_by=order).label('position')
+        rows = db.session.query(
+            position, Score.member_number, Score.chinese_name, Score.full_name,
+            Score.gross_score, Score.net_score, Score.points
+        ).filter(Score.tournament_id == tournament_id, column.isnot(None))\
+            .order_by(position, Score.member_number)\
+            .all()
+
+        return jsonify([{
+            'position': row.position,
+            'member_number': row.member_number,
+            'chinese_name': row.chinese_name,
+            'full_name': row.full_name,
+            'gross_score': row.gross_score,
+            'net_score': _number(row.net_score),
+            'points': row.points
+        } for row in rows])
+    except Exception as e:
+        current_app.logger.error(f"產生排行榜時發生錯誤: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({'error': '產生排行榜失敗', 'details': str(e)}), 500
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+@bp.route('/reports/handicap-series', methods=['GET'])
+def handicap_series_report():
+    """
+    所有會員在日期範圍內的差點走勢：?start=YYYY-MM-DD&end=YYYY-MM-DD&member_number=A001,F002
+    回傳依日期排列的賽事，以及每位會員的賽事索引與新差點陣列
+    """
+    try:
+        start = _parse_date(request.args.get('start'))
+        end = _parse_date(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': '日期格式錯誤，請使用 YYYY-MM-DD'}), 400
+    member_numbers = tuple(sorted({m.strip() for m in request.args.get('member_number', '').split(',') if m.strip()}))
+
+    try:
+        query = db.session.query(
+            Tournament.id, Tournament.name, Tournament.date, Tournament.score_revision, Tournament.updated_at)
+        if start is not None:
+            query = query.filter(Tournament.date >= start)
+        if end is not None:
+            query = query.filter(Tournament.date <= end)
+        tournaments = query.order_by(Tournament.date, Tournament.id).all()
+
+        # 鍵值包含範圍內各賽事的成績版本，成績異動後不會取到舊結果
+        versions = tuple((t.id, t.score_revision, t.updated_at) for t in tournaments)
+        key = handicap_series_cache.make_key([t.id for t in tournaments], start, end, member_numbers, versions)
+        body = handicap_series_cache.get(key)
+        if body is None:
+            series = handicap_series(tournaments, start, end, member_numbers)
+            body = jsonify({
+                'tournaments': [{'id': t.id, 'name': t.name, 'date': t.date.strftime('%Y-%m-%d')}
+                                for t in tournaments],
+                'members': series
+            }).get_data()
+            handicap_series_cache.set(key, body)
+        return current_app.response_class(body, mimetype='application/json')
+    except Exception as e:
+        current_app.logger.error(f"產生差點走勢時發生錯誤: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({'error': '產生差點走勢失敗', 'details': str(e)}), 500
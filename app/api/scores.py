@@ -5,15 +5,74 @@ bp = Blueprint('scores', __name__)
 # ... 其他路由代碼 ...
 from flask import jsonify, request, current_app
 from app.api import bp
-from app.models import Score, db, Tournament, Member
-import pandas as pd
-import os
-from werkzeug.utils import secure_filename
+from app.models import Score, db, Tournament
+from app.ingest import (IMPORT_MODES, MissingColumnsError, parse_score_batches, write_scores,
+                        scores_changed, find_duplicate_member_numbers, load_member_index,
+                        create_missing_members, collect_season_sources, parse_season_sources)
+from app.uploads import (UploadedFile, EXCEL_EXTENSIONS, SCORE_UPLOAD_EXTENSIONS, find_duplicate_upload,
+                         record_upload)
+from app.jobs import wants_async, enqueue_import
+from app.stats import annual_stats
+from app.cache import annual_stats_cache
+from app.pagination import keyset_page, CursorError, MAX_PAGE_SIZE
+from app.conditional import make_etag, not_modified, with_validators
+from app.serializers import score_serializer, FieldSetError
 import traceback
-from openpyxl import load_workbook
-import uuid
-import csv
-from sqlalchemy import func
+import json
+import zipfile
+
+# 錯誤訊息摘要最多列出的筆數，完整清單放在 errors 欄位
+MAX_ERROR_DETAILS = 20
+
+def error_detail(error):
+    """賽季匯入的錯誤會帶有檔案或工作表名稱 (sheet)"""
+    prefix = f'{error["sheet"]} ' if error.get('sheet') else ''
+    if error['row'] is None:
+        return f'{prefix}{error["message"]}'
+    return f'{prefix}第 {error["row"]} 行: {error["message"]}'
+
+def validation_error_payload(errors):
+    """列出所有驗證失敗的行"""
+    details = [error_detail(e) for e in errors[:MAX_ERROR_DETAILS]]
+    if len(errors) > MAX_ERROR_DETAILS:
+        details.append(f'……另有 {len(errors) - MAX_ERROR_DETAILS} 個錯誤')
+    return {
+        'error': f'共 {len({(e.get("sheet"), e["row"]) for e in errors})} 行數據驗證失敗',
+        'details': '\n'.join(details),
+        'errors': errors
+    }
+
+# GET /scores 可排序的欄位，前面加 - 表示降序
+SCORE_SORT_FIELDS = ('rank', 'gross_score', 'net_score', 'points', 'new_handicap', 'member_number')
+# 範圍篩選參數：(參數名稱, 欄位, 比較方式)
+SCORE_RANGE_FILTERS = (
+    ('gross_score_min', Score.gross_score, '>='),
+    ('gross_score_max', Score.gross_score, '<='),
+    ('net_score_min', Score.net_score, '>='),
+    ('net_score_max', Score.net_score, '<='),
+    ('rank_min', Score.rank, '>='),
+    ('rank_max', Score.rank, '<='),
+)
+
+def filter_scores(query, args):
+    """依查詢字串篩選成績：member_number、gender（會員編號字首）與數值範圍"""
+    member_number = args.get('member_number')
+    if member_number:
+        query = query.filter(Score.member_number == member_number)
+    gender = args.get('gender')
+    if gender == 'F':
+        query = query.filter(Score.member_number.like('F%'))
+    elif gender == 'M':
+        query = query.filter(~Score.member_number.like('F%'))
+    elif gender:
+        raise ValueError(f'不支援的性別篩選: {gender}')
+    for name, column, op in SCORE_RANGE_FILTERS:
+        value = args.get(name, type=float)
+        if value is None and args.get(name):
+            raise ValueError(f'{name} 必須為數字')
+        if value is not None:
+            query = query.filter(column >= value if op == '>=' else column <= value)
+    return query
 
 @bp.route('/scores', methods=['GET'])
 def get_scores():
@@ -21,9 +80,43 @@ def get_scores():
         tournament_id = request.args.get('tournament_id')
         if not tournament_id:
             return jsonify({'error': '未提供賽事ID'}), 400
-            
-        scores = Score.query.filter_by(tournament_id=tournament_id).all()
-        return jsonify([score.to_dict() for score in scores])
+        
+        sort = request.args.get('sort')
+        field = (sort or 'rank').lstrip('-')
+        if field not in SCORE_SORT_FIELDS:
+            return jsonify({'error': f'不支援的排序欄位: {field}'}), 400
+        column = getattr(Score, field)
+        descending = bool(sort) and sort.startswith('-')
+        
+        # 只查詢輸出需要的欄位（另加分頁用的排序欄位與 id）
+        try:
+            fields = score_serializer.parse_fields(request.args.get('fields'))
+        except FieldSetError as e:
+            return jsonify({'error': str(e)}), 400
+        select_names = score_serializer.select_names(fields, ('id', field))
+        row_to_dict = score_serializer.compile(select_names, fields)
+        try:
+            query = filter_scores(
+                db.session.query(*score_serializer.columns(select_names)).filter(Score.tournament_id == tournament_id),
+                request.args
+            )
+        except ValueError as e:
+            return jsonify({'error': '篩選參數錯誤', 'details': str(e)}), 400
+        
+        # 成績版本沒有變動時直接回傳 304，不查詢成績資料表
+        tournament = db.session.query(Tournament.score_revision, Tournament.scores_updated_at, Tournament.updated_at)\
+            .filter(Tournament.id == tournament_id).first()
+        if tournament is not None:
+            etag = make_etag('scores', tournament_id, tournament.score_revision)
+            last_modified = tournament.scores_updated_at or tournament.updated_at
+            response = not_modified(etag, last_modified)
+            if response is not None:
+                return response
+        
+        response = scores_response(query, row_to_dict, column, descending, sort, field)
+        if tournament is not None and response.status_code == 200:
+            with_validators(response, etag, last_modified)
+        return response
         
     except Exception as e:
         current_app.logger.error(f"獲取成績時發生錯誤: {str(e)}")
@@ -33,14 +126,101 @@ def get_scores():
             'details': str(e)
         }), 500
 
+def scores_response(query, row_to_dict, column, descending, sort, field):
+    """GET /scores 的列表或分頁回應"""
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    if limit is None and cursor is None:
+        # 未指定分頁時維持原本回傳完整列表
+        if sort:
+            order = column.desc() if descending else column
+            query = query.order_by(column.is_(None), order, Score.id)
+        return jsonify([row_to_dict(row) for row in query.all()])
+    
+    # keyset 分頁：依 (排序欄位, id) 接續上一頁，搭配 (tournament_id, 排序欄位, id) 索引
+    limit = min(max(limit or MAX_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    try:
+        rows, next_cursor = keyset_page(query, column, Score.id, sort or field, limit, cursor, descending)
+    except CursorError as e:
+        response = jsonify({'error': str(e)})
+        response.status_code = 400
+        return response
+    return jsonify({
+        'items': [row_to_dict(row) for row in rows],
+        'next_cursor': next_cursor,
+        'limit': limit
+    })
+
 @bp.route('/scores/<int:id>', methods=['GET'])
 def get_score(id):
     score = Score.query.get_or_404(id)
     return jsonify(score.to_dict())
 
+def duplicate_member_payload(duplicates):
+    """upsert 模式需以會員編號比對，重複的會員編號無法判斷要更新哪一行"""
+    return {
+        'error': '成績資料包含重複的會員編號',
+        'details': ', '.join(duplicates)
+    }
+
+def duplicate_upload_payload(message, previous, mode):
+    """與該賽事上次上傳內容相同時，不重新解析與寫入"""
+    return {
+        'message': message,
+        'count': previous.row_count,
+        'mode': mode,
+        'duplicate': True,
+        'changes': {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': previous.row_count}
+    }
+
+def run_score_import(upload, tournament_id, mode='replace', progress=None):
+    """
+    匯入賽事成績並自動建立找不到的會員，回傳 (payload, status_code)
+    不依賴請求物件，可在背景工作中執行
+    """
+    previous = find_duplicate_upload('score_import', upload.content_hash, tournament_id)
+    if previous:
+        current_app.logger.info(f'賽事ID {tournament_id} 的上傳內容與上次相同，略過匯入')
+        return duplicate_upload_payload('成績匯入成功', previous, mode), 200
+    
+    try:
+        # 逐批讀取並驗證（列名使用部分匹配）
+        records, errors = parse_score_batches(upload.iter_batches(), partial=True, progress=progress)
+    except MissingColumnsError as e:
+        return {'error': f'上傳檔案缺少以下欄位：{", ".join(e.missing_columns)}'}, 400
+    
+    if errors:
+        current_app.logger.error(f'成績資料驗證失敗，共 {len(errors)} 個錯誤')
+        return validation_error_payload(errors), 400
+    
+    duplicates = find_duplicate_member_numbers(records) if mode == 'upsert' else []
+    if duplicates:
+        return duplicate_member_payload(duplicates), 400
+    
+    try:
+        # 以單一查詢建立會員索引，找不到的會員一次批次建立
+        member_index = load_member_index({r['member_number'] for r in records})
+        created_members = create_missing_members(records, member_index)
+        
+        # 依上傳模式整批重寫或只寫入有變動的行
+        changes = write_scores(tournament_id, records, mode)
+        record_upload('score_import', upload, len(records), tournament_id=tournament_id)
+        
+        db.session.commit()
+        return {
+            'message': '成績匯入成功',
+            'count': len(records),
+            'mode': mode,
+            'changes': changes,
+            'created_members': created_members
+        }, 200
+        
+    except Exception as e:
+        db.session.rollback()
+        raise Exception(f'寫入成績失敗：{str(e)}')
+
 @bp.route('/scores/import/<int:tournament_id>', methods=['POST'])
 def import_scores(tournament_id):
-    temp_path = None
     try:
         if 'file' not in request.files:
             return jsonify({'error': '未找到上傳的檔案'}), 400
@@ -50,155 +230,36 @@ def import_scores(tournament_id):
             return jsonify({'error': '未選擇檔案'}), 400
         
         # 檢查檔案類型
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            return jsonify({'error': '不支援的檔案格式，請使用 Excel 檔案 (.xlsx 或 .xls)'}), 400
-        
-        # 保存原始檔案名
-        original_filename = file.filename
-        
-        # 創建臨時目錄（如果不存在）
-        upload_dir = os.path.join(current_app.instance_path, 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
+        if not file.filename.lower().endswith(SCORE_UPLOAD_EXTENSIONS):
+            return jsonify({'error': '不支援的檔案格式，請使用 Excel 檔案 (.xlsx 或 .xls) 或 CSV 檔案 (.csv 或 .tsv)'}), 400
         
-        # 使用原始檔案名保存檔案
-        temp_path = os.path.join(upload_dir, original_filename)
+        mode = request.values.get('mode', 'replace')
+        if mode not in IMPORT_MODES:
+            return jsonify({'error': f'不支援的上傳模式: {mode}'}), 400
         
-        # 保存檔案
-        file.save(temp_path)
+        # 直接從請求串流讀取，背景處理時交給工作執行緒
+        upload = UploadedFile(file)
+        if wants_async(request.values):
+            job = enqueue_import('score_import', upload, run_score_import, tournament_id, mode)
+            return jsonify(job.to_dict()), 202
         
-        try:
-            # 使用 pandas 讀取 Excel 檔案
-            df = pd.read_excel(temp_path)
-            
-            # 清理列名（移除空白和特殊字符）
-            df.columns = df.columns.str.strip().str.replace('\ufeff', '').str.replace('\u3000', ' ')
-            
-            # 檢查必要的欄位是否存在
-            required_columns = ['會員編號', 'HOLE', '姓名', '淨桿名次', '總桿數', 
-                              '前次差點', '淨桿桿數', '差點增減', '新差點', '積分']
-            
-            # 檢查每個必要欄位
-            missing_columns = []
-            column_mapping = {}
-            for col in required_columns:
-                found = False
-                for existing_col in df.columns:
-                    if col in existing_col:  # 使用部分匹配
-                        column_mapping[col] = existing_col
-                        found = True
-                        break
-                if not found:
-                    missing_columns.append(col)
-            
-            if missing_columns:
-                raise Exception(f'Excel 檔案缺少以下欄位：{", ".join(missing_columns)}')
-            
-            # 重命名列以匹配所需的名稱
-            df = df.rename(columns=column_mapping)
-            
-            # 清理數據
-            for col in df.columns:
-                if df[col].dtype == object:  # 如果是字符串類型
-                    df[col] = df[col].astype(str).str.strip()
-            
-            # 刪除該賽事的所有現有成績
-            Score.query.filter_by(tournament_id=tournament_id).delete()
-            
-            # 處理每一行數據
-            for _, row in df.iterrows():
-                try:
-                    score = Score(tournament_id=tournament_id)
-                    
-                    # 設置各個欄位，處理可能的空值和特殊字符
-                    score.member_number = str(row['會員編號']).strip() if pd.notna(row['會員編號']) else None
-                    score.full_name = str(row['HOLE']).strip() if pd.notna(row['HOLE']) else None
-                    score.chinese_name = str(row['姓名']).strip() if pd.notna(row['姓名']) else None
-                    
-                    # 處理數值欄位
-                    try:
-                        score.net_rank = int(row['淨桿名次']) if pd.notna(row['淨桿名次']) else None
-                    except (ValueError, TypeError):
-                        score.net_rank = None
-                        
-                    try:
-                        score.gross_score = int(row['總桿數']) if pd.notna(row['總桿數']) else None
-                    except (ValueError, TypeError):
-                        score.gross_score = None
-                        
-                    try:
-                        score.previous_handicap = float(row['前次差點']) if pd.notna(row['前次差點']) else None
-                    except (ValueError, TypeError):
-                        score.previous_handicap = None
-                        
-                    try:
-                        score.net_score = float(row['淨桿桿數']) if pd.notna(row['淨桿桿數']) else None
-                    except (ValueError, TypeError):
-                        score.net_score = None
-                        
-                    try:
-                        score.handicap_change = float(row['差點增減']) if pd.notna(row['差點增減']) else None
-                    except (ValueError, TypeError):
-                        score.handicap_change = None
-                        
-                    try:
-                        score.new_handicap = float(row['新差點']) if pd.notna(row['新差點']) else None
-                    except (ValueError, TypeError):
-                        score.new_handicap = None
-                        
-                    try:
-                        score.points = int(row['積分']) if pd.notna(row['積分']) else None
-                    except (ValueError, TypeError):
-                        score.points = None
-                    
-                    # 根據會員編號查找會員 ID
-                    if score.member_number:
-                        member = Member.query.filter_by(member_number=score.member_number).first()
-                        if member:
-                            score.member_id = member.id
-                        else:
-                            # 如果找不到會員，創建一個新的會員
-                            member = Member(
-                                member_number=score.member_number,
-                                name=score.chinese_name,
-                                handicap=score.new_handicap
-                            )
-                            db.session.add(member)
-                            db.session.flush()  # 獲取新創建的會員 ID
-                            score.member_id = member.id
-                    
-                    db.session.add(score)
-                
-                except Exception as row_error:
-                    current_app.logger.error(f'處理行數據時發生錯誤：{str(row_error)}')
-                    current_app.logger.error(f'行數據：{row.to_dict()}')
-                    raise Exception(f'處理行數據時發生錯誤：{str(row_error)}')
-            
-            db.session.commit()
-            return jsonify({'message': '成績匯入成功'})
-            
-        except Exception as e:
-            db.session.rollback()
-            raise Exception(f'讀取檔案失敗：{str(e)}')
+        with upload:
+            payload, status_code = run_score_import(upload, tournament_id, mode)
+        return jsonify(payload), status_code
     
     except Exception as e:
         current_app.logger.error(f'匯入成績時發生錯誤：{str(e)}')
         current_app.logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
-    
-    finally:
-        # 清理臨時檔案
-        try:
-            if temp_path and os.path.exists(temp_path):
-                os.remove(temp_path)
-        except Exception as e:
-            current_app.logger.error(f'清理臨時檔案時發生錯誤：{str(e)}')
 
 @bp.route('/scores', methods=['POST'])
 def create_score():
     data = request.get_json()
     score = Score()
     score.from_dict(data)
+    score.tournament_id = data.get('tournament_id')
     db.session.add(score)
+    scores_changed([score.tournament_id], member_numbers=[score.member_number])
     db.session.commit()
     return jsonify(score.to_dict()), 201
 
@@ -206,7 +267,9 @@ def create_score():
 def update_score(id):
     score = Score.query.get_or_404(id)
     data = request.get_json()
+    previous_member_number = score.member_number
     score.from_dict(data)
+    scores_changed([score.tournament_id], member_numbers={previous_member_number, score.member_number})
     db.session.commit()
     return jsonify(score.to_dict())
 
@@ -214,6 +277,7 @@ def update_score(id):
 def delete_score(id):
     score = Score.query.get_or_404(id)
     db.session.delete(score)
+    scores_changed([score.tournament_id], member_numbers=[score.member_number])
     db.session.commit()
     return '', 204
 
@@ -221,12 +285,53 @@ def delete_score(id):
 def clear_scores():
     try:
         Score.query.delete()
+        scores_changed()
         db.session.commit()
         return jsonify({'message': '成功清除所有成績資料'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def run_score_upload(upload, tournament_id, mode='replace', progress=None):
+    """
+    驗證並寫入賽事成績，回傳 (payload, status_code)
+    不依賴請求物件，可在背景工作中執行
+    """
+    previous = find_duplicate_upload('score_upload', upload.content_hash, tournament_id)
+    if previous:
+        current_app.logger.info(f"賽事ID {tournament_id} 的上傳內容與上次相同，略過解析與寫入")
+        return duplicate_upload_payload('成績上傳成功', previous, mode), 200
+    
+    # 逐批讀取並驗證，一次回報所有錯誤的行
+    current_app.logger.info(f"開始讀取上傳檔案: {upload.filename}")
+    try:
+        records, errors = parse_score_batches(upload.iter_batches(), progress=progress)
+    except MissingColumnsError as e:
+        current_app.logger.error(f"缺少必要的列: {e.missing_columns}")
+        return {
+            'error': str(e),
+            'found_columns': e.found_columns  # 返回找到的列名，以便調試
+        }, 400
+    except Exception as e:
+        current_app.logger.error(f"讀取上傳檔案失敗: {str(e)}")
+        return {'error': '讀取上傳檔案失敗', 'details': str(e)}, 400
+    
+    if errors:
+        current_app.logger.error(f"成績資料驗證失敗，共 {len(errors)} 個錯誤")
+        return validation_error_payload(errors), 400
+    
+    duplicates = find_duplicate_member_numbers(records) if mode == 'upsert' else []
+    if duplicates:
+        return duplicate_member_payload(duplicates), 400
+        
+    # replace：刪除該賽事的現有成績後批次寫入；upsert：只寫入有變動的行
+    current_app.logger.info(f"以 {mode} 模式寫入賽事ID {tournament_id} 的成績")
+    changes = write_scores(tournament_id, records, mode)
+    record_upload('score_upload', upload, len(records), tournament_id=tournament_id)
+    db.session.commit()
+    current_app.logger.info(f"成績上傳成功，共 {len(records)} 筆，變動: {changes}")
+    return {'message': '成績上傳成功', 'count': len(records), 'mode': mode, 'changes': changes}, 200
+
 @bp.route('/scores/upload', methods=['POST'])
 def upload_scores():
     try:
@@ -237,7 +342,7 @@ def upload_scores():
             return jsonify({'error': '未找到文件'}), 400
             
         file = request.files['file']
-        tournament_id = request.form.get('tournament_id')
+        tournament_id = request.form.get('tournament_id', type=int)
         
         current_app.logger.info(f"接收到的文件名: {file.filename}")
         current_app.logger.info(f"賽事ID: {tournament_id}")
@@ -250,155 +355,24 @@ def upload_scores():
             current_app.logger.error("未選擇文件")
             return jsonify({'error': '未選擇文件'}), 400
             
-        if not file.filename.endswith(('.xlsx', '.xls')):
+        if not file.filename.lower().endswith(SCORE_UPLOAD_EXTENSIONS):
             current_app.logger.error(f"不支持的文件格式: {file.filename}")
             return jsonify({'error': '不支持的文件格式'}), 400
             
-        # 保存文件到臨時目錄
-        temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(file.filename))
-        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-        file.save(temp_path)
-        
-        # 讀取Excel文件
-        current_app.logger.info("開始讀取Excel文件")
-        try:
-            # 嘗試使用 openpyxl 引擎
-            try:
-                df = pd.read_excel(temp_path, engine='openpyxl')
-            except Exception as e1:
-                current_app.logger.warning(f"使用 openpyxl 引擎失敗: {str(e1)}")
-                # 如果失敗，嘗試使用 xlrd 引擎
-                try:
-                    df = pd.read_excel(temp_path, engine='xlrd')
-                except Exception as e2:
-                    current_app.logger.warning(f"使用 xlrd 引擎失敗: {str(e2)}")
-                    # 最後嘗試不指定引擎
-                    df = pd.read_excel(temp_path)
-            
-            current_app.logger.info(f"Excel列名: {df.columns.tolist()}")
+        mode = request.form.get('mode', 'replace')
+        if mode not in IMPORT_MODES:
+            current_app.logger.error(f"不支持的上傳模式: {mode}")
+            return jsonify({'error': f'不支持的上傳模式: {mode}'}), 400
             
-            # 清理臨時文件
-            os.remove(temp_path)
-            
-        except Exception as e:
-            current_app.logger.error(f"讀取Excel文件失敗: {str(e)}")
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            return jsonify({'error': '讀取Excel文件失敗', 'details': str(e)}), 400
-        
-        # 列名映射（支持多種可能的列名）
-        column_mappings = {
-            '會員編號': ['會員編號', '會員號碼', 'Member No', 'MemberNo'],
-            'HOLE': ['HOLE', 'HOLE NAME', '全名', 'Full Name'],
-            '姓名': ['姓名', '中文姓名', 'Name', 'Chinese Name'],
-            '淨桿名次': ['淨桿名次', '名次', 'Rank', 'Net Rank'],
-            '總桿數': ['總桿數', '總桿', 'Gross Score', 'Total'],
-            '前次差點': ['前次差點', '原差點', 'Previous Handicap', 'Old Handicap'],
-            '淨桿桿數': ['淨桿桿數', '淨桿', 'Net Score'],
-            '差點增減': ['差點增減', '差點增减', '增減', '增减', '差點增減值', 'Handicap Change'],
-            '新差點': ['新差點', '新的差點', 'New Handicap'],
-            '積分': ['積分', 'Points', 'Score']
-        }
-        
-        # 檢查每個必要的列是否存在（使用映射）
-        missing_columns = []
-        column_map = {}  # 存儲實際使用的列名映射
-        
-        for required_col, possible_names in column_mappings.items():
-            found = False
-            for name in possible_names:
-                if name in df.columns:
-                    column_map[required_col] = name
-                    found = True
-                    break
-            if not found:
-                missing_columns.append(required_col)
-        
-        if missing_columns:
-            current_app.logger.error(f"缺少必要的列: {missing_columns}")
-            return jsonify({
-                'error': f'缺少必要的列: {", ".join(missing_columns)}',
-                'found_columns': df.columns.tolist()  # 返回找到的列名，以便調試
-            }), 400
-            
-        # 重命名列以統一處理
-        df = df.rename(columns={v: k for k, v in column_map.items()})
-            
-        # 刪除該賽事的現有成績
-        current_app.logger.info(f"刪除賽事ID {tournament_id} 的現有成績")
-        Score.query.filter_by(tournament_id=tournament_id).delete()
+        # 直接從請求串流讀取，背景處理時交給工作執行緒
+        upload = UploadedFile(file)
+        if wants_async(request.values):
+            job = enqueue_import('score_upload', upload, run_score_upload, tournament_id, mode)
+            return jsonify(job.to_dict()), 202
         
-        # 添加新的成績記錄
-        current_app.logger.info("開始添加新的成績記錄")
-        for index, row in df.iterrows():
-            try:
-                current_app.logger.info(f"處理第 {index + 1} 行數據")
-                current_app.logger.info(f"行數據: {row.to_dict()}")
-                
-                # 數據預處理和驗證
-                member_number = str(row['會員編號']).strip()
-                if not member_number or len(member_number) > 4:
-                    raise ValueError(f"無效的會員編號: {member_number}")
-                
-                # 檢查會員編號格式
-                if not (member_number[0].isalpha() and member_number[1:].isdigit() and len(member_number[1:]) <= 3):
-                    raise ValueError(f"會員編號格式錯誤（應為一個英文字母+最多三位數字）: {member_number}")
-                
-                full_name = str(row['HOLE']).strip() if pd.notna(row['HOLE']) else None
-                chinese_name = str(row['姓名']).strip() if pd.notna(row['姓名']) else None
-                
-                # 處理數值欄位
-                try:
-                    rank = int(row['淨桿名次']) if pd.notna(row['淨桿名次']) else None
-                    gross_score = int(row['總桿數']) if pd.notna(row['總桿數']) else None
-                except ValueError as e:
-                    raise ValueError(f"淨桿名次或總桿數必須為整數")
-                
-                # 處理浮點數欄位，確保最多2位小數
-                try:
-                    previous_handicap = round(float(row['前次差點']), 2) if pd.notna(row['前次差點']) else None
-                    net_score = round(float(row['淨桿桿數']), 2) if pd.notna(row['淨桿桿數']) else None
-                    handicap_change = round(float(row['差點增減']), 2) if pd.notna(row['差點增減']) else None
-                    new_handicap = round(float(row['新差點']), 2) if pd.notna(row['新差點']) else None
-                except ValueError as e:
-                    raise ValueError(f"差點相關欄位必須為數值")
-                
-                try:
-                    points = int(row['積分']) if pd.notna(row['積分']) else None
-                except ValueError as e:
-                    raise ValueError(f"積分必須為整數")
-                
-                # 創建成績記錄
-                score = Score(
-                    tournament_id=tournament_id,
-                    member_number=member_number,
-                    full_name=full_name,
-                    chinese_name=chinese_name,
-                    rank=rank,
-                    gross_score=gross_score,
-                    previous_handicap=previous_handicap,
-                    net_score=net_score,
-                    handicap_change=handicap_change,
-                    new_handicap=new_handicap,
-                    points=points
-                )
-                
-                db.session.add(score)
-                current_app.logger.info(f"成功添加第 {index + 1} 行數據")
-                
-            except Exception as row_error:
-                current_app.logger.error(f"處理第 {index + 1} 行數據時發生錯誤: {str(row_error)}")
-                current_app.logger.error(f"行數據: {row.to_dict()}")
-                db.session.rollback()
-                return jsonify({
-                    'error': f'處理第 {index + 1} 行數據時發生錯誤',
-                    'details': str(row_error)
-                }), 400
-            
-        current_app.logger.info("提交所有更改到數據庫")
-        db.session.commit()
-        current_app.logger.info("成績上傳成功")
-        return jsonify({'message': '成績上傳成功'})
+        with upload:
+            payload, status_code = run_score_upload(upload, tournament_id, mode)
+        return jsonify(payload), status_code
         
     except Exception as e:
         db.session.rollback()
@@ -409,6 +383,141 @@ def upload_scores():
             'details': str(e)
         }), 500
 
+def resolve_season_tournaments(names, mapping):
+    """
+    將來源名稱對應到賽事ID：mapping 中有指定的優先使用，
+    其餘以賽事名稱完全相符對應，回傳 ({name: tournament_id}, 錯誤訊息列表)
+    """
+    resolved, problems = {}, []
+    mapped_ids = {int(v) for k, v in mapping.items() if k in names}
+    known_ids = {t.id for t in Tournament.query.filter(Tournament.id.in_(mapped_ids))} if mapped_ids else set()
+    unmapped = [n for n in names if n not in mapping]
+    by_name = {}
+    if unmapped:
+        for t in Tournament.query.filter(Tournament.name.in_(unmapped)):
+            by_name.setdefault(t.name, []).append(t.id)
+
+    for name in names:
+        if name in mapping:
+            tournament_id = int(mapping[name])
+            if tournament_id in known_ids:
+                resolved[name] = tournament_id
+            else:
+                problems.append(f'{name}: 找不到賽事ID {tournament_id}')
+        elif len(by_name.get(name, [])) == 1:
+            resolved[name] = by_name[name][0]
+        elif name in by_name:
+            problems.append(f'{name}: 有多個同名賽事，請在 mapping 中指定賽事ID')
+        else:
+            problems.append(f'{name}: 找不到同名賽事')
+    return resolved, problems
+
+def run_season_import(upload, mapping, mode='replace', max_workers=None, progress=None):
+    """
+    匯入整個賽季的成績：壓縮檔中的每個成績檔或活頁簿中的每個工作表各對應一場賽事，
+    以行程池平行解析，全部驗證通過後在同一個交易中寫入，回傳 (payload, status_code)
+    """
+    try:
+        sources = collect_season_sources(upload)
+    except (zipfile.BadZipFile, ValueError) as e:
+        return {'error': '無法讀取上傳檔案', 'details': str(e)}, 400
+    if not sources:
+        return {'error': '上傳檔案中沒有可匯入的成績檔或工作表'}, 400
+
+    names = [source[0] for source in sources]
+
+    # 先對應賽事再解析，對應失敗時不必浪費時間讀取檔案
+    tournament_ids, problems = resolve_season_tournaments(names, mapping)
+    if problems:
+        return {'error': '部分成績檔無法對應到賽事', 'details': '\n'.join(problems)}, 400
+
+    results = parse_season_sources(sources, max_workers=max_workers, progress=progress)
+
+    errors = []
+    for name in names:
+        records, source_errors, missing_columns = results[name]
+        if missing_columns:
+            errors.append({'sheet': name, 'row': None, 'column': None, 'value': None,
+                           'message': f'缺少以下欄位：{", ".join(missing_columns)}'})
+        errors.extend(dict(e, sheet=name) for e in source_errors)
+        if mode == 'upsert' and not source_errors:
+            for member_number in find_duplicate_member_numbers(records):
+                errors.append({'sheet': name, 'row': None, 'column': '會員編號', 'value': member_number,
+                               'message': f'重複的會員編號 {member_number}'})
+    if errors:
+        current_app.logger.error(f'賽季成績驗證失敗，共 {len(errors)} 個錯誤')
+        return validation_error_payload(errors), 400
+
+    try:
+        all_records = [r for name in names for r in results[name][0]]
+        member_index = load_member_index({r['member_number'] for r in all_records})
+        created_members = create_missing_members(all_records, member_index)
+
+        tournaments = []
+        for name in names:
+            records = results[name][0]
+            changes = write_scores(tournament_ids[name], records, mode)
+            tournaments.append({
+                'name': name,
+                'tournament_id': tournament_ids[name],
+                'count': len(records),
+                'changes': changes
+            })
+
+        db.session.commit()
+        return {
+            'message': '賽季成績匯入成功',
+            'count': len(all_records),
+            'mode': mode,
+            'tournaments': tournaments,
+            'created_members': created_members
+        }, 200
+
+    except Exception as e:
+        db.session.rollback()
+        raise Exception(f'寫入成績失敗：{str(e)}')
+
+@bp.route('/scores/import-season', methods=['POST'])
+def import_season_scores():
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': '未找到上傳的檔案'}), 400
+
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': '未選擇檔案'}), 400
+
+        if not file.filename.lower().endswith(('.zip',) + EXCEL_EXTENSIONS):
+            return jsonify({'error': '不支援的檔案格式，請使用壓縮檔 (.zip) 或 Excel 檔案 (.xlsx 或 .xls)'}), 400
+
+        mode = request.values.get('mode', 'replace')
+        if mode not in IMPORT_MODES:
+            return jsonify({'error': f'不支援的上傳模式: {mode}'}), 400
+
+        # mapping：{"檔名或工作表名稱": 賽事ID}，未列出的以賽事名稱對應
+        try:
+            mapping = json.loads(request.values.get('mapping') or '{}')
+            if not isinstance(mapping, dict):
+                raise ValueError('mapping 必須是物件')
+            mapping = {str(k): int(v) for k, v in mapping.items()}
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': 'mapping 格式錯誤', 'details': str(e)}), 400
+
+        max_workers = current_app.config.get('SEASON_IMPORT_WORKERS')
+        upload = UploadedFile(file)
+        if wants_async(request.values):
+            job = enqueue_import('season_import', upload, run_season_import, mapping, mode, max_workers)
+            return jsonify(job.to_dict()), 202
+
+        with upload:
+            payload, status_code = run_season_import(upload, mapping, mode, max_workers)
+        return jsonify(payload), status_code
+
+    except Exception as e:
+        current_app.logger.error(f'匯入賽季成績時發生錯誤：{str(e)}')
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/scores/annual-stats', methods=['POST'])
 def get_annual_stats():
     try:
@@ -418,71 +527,37 @@ def get_annual_stats():
         if not tournament_ids:
             return jsonify({'error': '請選擇至少一個賽事'}), 400
             
-        # 獲取所選賽事的所有成績
-        scores = Score.query.filter(Score.tournament_id.in_(tournament_ids)).all()
-        tournaments = Tournament.query.filter(Tournament.id.in_(tournament_ids)).all()
-        
-        # 建立賽事 ID 到名稱的映射
-        tournament_names = {t.id: t.name for t in tournaments}
-        
-        # 按會員分組統計數據
-        stats = {}
-        for score in scores:
-            if score.member_number not in stats:
-                stats[score.member_number] = {
-                    'member_number': score.member_number,
-                    'name': score.chinese_name,
-                    'gender': 'F' if score.member_number.startswith('F') else 'M',
-                    'full_name': score.full_name,
-                    'total_gross_scores': [],
-                    'participation_count': 0,
-                    'handicaps': [],
-                    'total_points': 0,
-                    'tournaments': []
-                }
-            
-            member_stats = stats[score.member_number]
-            member_stats['participation_count'] += 1
-            
-            if score.gross_score is not None:
-                member_stats['total_gross_scores'].append(score.gross_score)
-            if score.new_handicap is not None:
-                member_stats['handicaps'].append(score.new_handicap)
-            if score.points is not None:
-                member_stats['total_points'] += score.points
-                
-            # 添加個別賽事資料
-            member_stats['tournaments'].append({
-                'tournament_name': tournament_names[score.tournament_id],
-                'new_handicap': score.new_handicap,
-                'gross_score': score.gross_score,
-                'net_score': score.net_score,
-                'rank': score.rank,
-                'points': score.points
-            })
-        
-        # 計算平均值並格式化數據
-        result = []
-        for member_number, member_stats in stats.items():
-            avg_gross = sum(member_stats['total_gross_scores']) / len(member_stats['total_gross_scores']) if member_stats['total_gross_scores'] else 0
-            avg_handicap = sum(member_stats['handicaps']) / len(member_stats['handicaps']) if member_stats['handicaps'] else 0
-            
-            result.append({
-                'member_number': member_number,
-                'name': member_stats['name'],
-                'gender': member_stats['gender'],
-                'full_name': member_stats['full_name'],
-                'avg_gross_score': round(avg_gross, 1),
-                'participation_count': member_stats['participation_count'],
-                'avg_handicap': round(avg_handicap, 1),
-                'total_points': member_stats['total_points'],
-                'tournaments': sorted(member_stats['tournaments'], key=lambda x: x['tournament_name'])
-            })
-        
-        # 按總積分降序排序
-        result.sort(key=lambda x: x['total_points'], reverse=True)
+        # 分頁與篩選參數可放在 JSON 內容或查詢字串
+        options = dict(request.args.items())
+        options.update(data)
+        try:
+            limit = options.get('limit')
+            limit = int(limit) if limit not in (None, '') else None
+            offset = int(options.get('offset') or 0)
+            if (limit is not None and limit < 0) or offset < 0:
+                raise ValueError('limit 與 offset 不可為負數')
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': '分頁參數錯誤', 'details': str(e)}), 400
+        gender = options.get('gender') or None
+        if gender not in (None, 'M', 'F'):
+            return jsonify({'error': f'不支援的性別篩選: {gender}'}), 400
+        include_tournaments = str(options.get('include_tournaments', True)).lower() not in ('0', 'false', 'no', 'off')
         
-        return jsonify(result)
+        # 相同賽事組合與參數直接回傳快取的 JSON，成績異動時失效；
+        # 鍵值包含各賽事的成績版本，其他行程寫入的成績也不會讀到舊結果
+        versions = tuple(db.session.query(Tournament.id, Tournament.score_revision, Tournament.updated_at)
+                         .filter(Tournament.id.in_(tournament_ids)).order_by(Tournament.id))
+        key = annual_stats_cache.make_key(tournament_ids, gender, limit, offset, include_tournaments, versions)
+        cached = annual_stats_cache.get(key)
+        if cached is None:
+            result, total = annual_stats(tournament_ids, gender, limit, offset, include_tournaments)
+            body = jsonify(result).get_data()
+            cached = (body, total)
+            annual_stats_cache.set(key, cached, size=len(body))
+        body, total = cached
+        response = current_app.response_class(body, mimetype='application/json')
+        response.headers['X-Total-Count'] = str(total)
+        return response
         
     except Exception as e:
         current_app.logger.error(f"計算年度總成績時發生錯誤: {str(e)}")
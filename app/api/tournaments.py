@@ -5,7 +5,12 @@ bp = Blueprint('tournaments', __name__)
 # ... 其他路由代碼 ...
 from flask import jsonify, request, current_app
 from app.api import bp
-from app.models import Tournament, db
+from app.models import Tournament, TournamentStats, db
+from app.ingest import scores_changed
+from app.cache import invalidate_tournament_results
+from app.conditional import make_etag, not_modified, with_validators
+from sqlalchemy import func
+from app.serializers import tournament_serializer, FieldSetError
 import logging
 import traceback
 import json
@@ -17,8 +22,35 @@ logger = current_app.logger if current_app else logging.getLogger(__name__)
 @bp.route('/tournaments', methods=['GET'])
 def get_tournaments():
     try:
-        tournaments = Tournament.query.all()
-        return jsonify([t.to_dict() for t in tournaments])
+        try:
+            fields = tournament_serializer.parse_fields(request.args.get('fields'))
+        except FieldSetError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        include_stats = request.args.get('include_stats', '').lower() in ('1', 'true', 'yes')
+        
+        # 賽事列表沒有變動時直接回傳 304（成績版本總和反映統計快照的變動）
+        # 刪除賽事不會讓最大 updated_at 前進，列表只以 ETag 驗證，不提供 Last-Modified
+        count, max_id, last_modified, revisions = db.session.query(
+            func.count(Tournament.id), func.max(Tournament.id), func.max(Tournament.updated_at),
+            func.sum(Tournament.score_revision)
+        ).one()
+        etag = make_etag('tournaments', count, max_id, last_modified, revisions)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        
+        # 只查詢需要的欄位，不建立 Tournament 物件（附統計時另需 id 對應快照）
+        select_names = tournament_serializer.select_names(fields, ('id',) if include_stats else ())
+        row_to_dict = tournament_serializer.compile(select_names, fields)
+        rows = db.session.query(*tournament_serializer.columns(select_names)).order_by(Tournament.id).all()
+        result = [row_to_dict(row) for row in rows]
+        if include_stats:
+            # 統計快照以一次查詢取得，不需逐一請求各賽事
+            stats = {s.tournament_id: s.to_dict() for s in TournamentStats.query}
+            for item, row in zip(result, rows):
+                item['stats'] = stats.get(row.id)
+        return with_validators(jsonify(result), etag)
     except Exception as e:
         current_app.logger.error(f"Error fetching tournaments: {str(e)}")
         current_app.logger.error(traceback.format_exc())
@@ -31,7 +63,10 @@ def get_tournaments():
 def get_tournament(id):
     try:
         tournament = Tournament.query.get_or_404(id)
-        return jsonify(tournament.to_dict())
+        result = tournament.to_dict()
+        stats = TournamentStats.query.get(id)
+        result['stats'] = stats.to_dict() if stats else None
+        return jsonify(result)
     except Exception as e:
         current_app.logger.error(f"Error fetching tournament {id}: {str(e)}")
         current_app.logger.error(traceback.format_exc())
@@ -144,10 +179,17 @@ def update_tournament(id):
                 }), 400
 
             # 更新數據
+            previous_year = tournament.date.year
             tournament.name = data['name']
             tournament.location = data['location']
             tournament.date = tournament_date
             tournament.notes = data.get('notes', '')
+            if tournament_date.year != previous_year:
+                # 改到其他年度時，兩個年度的積分榜都要重新計算
+                scores_changed([id], years=[previous_year, tournament_date.year])
+            else:
+                # 統計結果包含賽事名稱
+                invalidate_tournament_results([id])
 
             db.session.commit()
             
@@ -174,7 +216,9 @@ def update_tournament(id):
 def delete_tournament(id):
     try:
         tournament = Tournament.query.get_or_404(id)
+        year = tournament.date.year
         db.session.delete(tournament)
+        scores_changed([id], years=[year])
         db.session.commit()
         return '', 204
     except Exception as e:
@@ -0,0 +1,110 @@
+"""行程內的查詢結果快取：LRU 淘汰，依賽事ID失效，逾時自動過期"""
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+
+# 預設最多保留的項目數與總位元組數
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# 項目的存活秒數：其他行程的寫入無法通知本行程，逾時後一律重新查詢
+DEFAULT_TTL = 300
+
+
+class TournamentResultCache:
+    """
+    以賽事ID組合為鍵快取已序列化的回應內容
+    key 為 (排序後的賽事ID tuple, 其他參數...)，超過項目數或總大小時淘汰最久未使用的項目，
+    存放超過 ttl 秒的項目視為不存在（ttl 為 None 表示不過期）
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(tournament_ids, *params):
+        """正規化賽事ID組合：去除重複並排序"""
+        return (tuple(sorted({int(i) for i in tournament_ids})),) + params
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] is not None and entry[2] <= time.monotonic():
+                self._size -= self._entries.pop(key)[1]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, size=None):
+        """size 未指定時以 len(value) 計算（value 為 bytes 時即為位元組數）"""
+        size = len(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (value, size, expires_at)
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def invalidate(self, tournament_ids=None):
+        """清除包含任一指定賽事的項目，tournament_ids 為 None 表示全部清除"""
+        with self._lock:
+            if tournament_ids is None:
+                self._entries.clear()
+                self._size = 0
+                return
+            changed = {int(i) for i in tournament_ids}
+            for key in [k for k in self._entries if changed.intersection(k[0])]:
+                self._size -= self._entries.pop(key)[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+annual_stats_cache = TournamentResultCache()
+handicap_series_cache = TournamentResultCache()
+
+# 交易提交後需再次失效的賽事ID，None 表示全部
+_PENDING_KEY = 'invalidate_tournament_results'
+
+
+def invalidate_tournament_results(tournament_ids=None):
+    """
+    成績異動時呼叫：立即清除相關快取，並在交易提交後再清除一次，
+    避免提交前其他請求以舊資料重新建立快取
+    """
+    for cache in (annual_stats_cache, handicap_series_cache):
+        cache.invalidate(tournament_ids)
+    pending = db.session.info.get(_PENDING_KEY, set())
+    if pending is None or tournament_ids is None:
+        db.session.info[_PENDING_KEY] = None
+    else:
+        pending.update(tournament_ids)
+        db.session.info[_PENDING_KEY] = pending
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if _PENDING_KEY in session.info:
+        tournament_ids = session.info.pop(_PENDING_KEY)
+        for cache in (annual_stats_cache, handicap_series_cache):
+            cache.invalidate(tournament_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,37 @@
+"""條件式 GET：以 ETag / Last-Modified 讓沒有變動的資料直接回傳 304"""
+import hashlib
+from datetime import timezone
+from flask import request, current_app
+
+
+def make_etag(*parts):
+    """由版本資訊組成強 ETag，請求參數不同時 ETag 也不同"""
+    raw = '|'.join(str(p) for p in parts) + '|' + request.query_string.decode()
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def not_modified(etag, last_modified=None):
+    """
+    If-None-Match 符合，或未送 If-None-Match 但 If-Modified-Since 不早於 last_modified 時，
+    回傳 304 回應，否則回傳 None
+    """
+    if request.if_none_match:
+        if not request.if_none_match.contains(etag):
+            return None
+    else:
+        since = request.if_modified_since
+        if last_modified is None or since is None:
+            return None
+        # HTTP 日期只到秒，last_modified 為 UTC 時間
+        if since < last_modified.replace(microsecond=0, tzinfo=timezone.utc):
+            return None
+    return with_validators(current_app.response_class(status=304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified=None):
+    """加上 ETag / Last-Modified，並要求用戶端每次重新驗證"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
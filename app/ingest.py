@@ -0,0 +1,426 @@
+"""成績資料匯入：整欄轉型、驗證與批次寫入"""
+import multiprocessing
+import os
+import posixpath
+import zipfile
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from sqlalchemy import bindparam
+from app import db
+from app.models import Score, Member, Tournament
+from app.uploads import UploadedFile, SCORE_UPLOAD_EXTENSIONS, forget_score_uploads
+from app.stats import season_years, refresh_member_standings, refresh_tournament_stats
+from app.cache import invalidate_tournament_results
+
+# 列名映射（支持多種可能的列名）
+SCORE_COLUMN_MAPPINGS = {
+    '會員編號': ['會員編號', '會員號碼', 'Member No', 'MemberNo'],
+    'HOLE': ['HOLE', 'HOLE NAME', '全名', 'Full Name'],
+    '姓名': ['姓名', '中文姓名', 'Name', 'Chinese Name'],
+    '淨桿名次': ['淨桿名次', '名次', 'Rank', 'Net Rank'],
+    '總桿數': ['總桿數', '總桿', 'Gross Score', 'Total'],
+    '前次差點': ['前次差點', '原差點', 'Previous Handicap', 'Old Handicap'],
+    '淨桿桿數': ['淨桿桿數', '淨桿', 'Net Score'],
+    '差點增減': ['差點增減', '差點增减', '差點新增', '增減', '增减', '差點增減值', 'Handicap Change'],
+    '新差點': ['新差點', '新的差點', 'New Handicap'],
+    '積分': ['積分', 'Points', 'Score']
+}
+
+# Excel 欄位與 Score 欄位的對應
+TEXT_COLUMNS = {'HOLE': 'full_name', '姓名': 'chinese_name'}
+INT_COLUMNS = {'淨桿名次': 'rank', '總桿數': 'gross_score', '積分': 'points'}
+FLOAT_COLUMNS = {
+    '前次差點': 'previous_handicap',
+    '淨桿桿數': 'net_score',
+    '差點增減': 'handicap_change',
+    '新差點': 'new_handicap'
+}
+
+# 寫入 Score 的資料欄位（不含 tournament_id）
+SCORE_FIELDS = ['member_number'] + list(TEXT_COLUMNS.values()) + \
+    list(INT_COLUMNS.values()) + list(FLOAT_COLUMNS.values())
+
+# 上傳模式：replace 刪除後全部重寫，upsert 只寫入有變動的行
+IMPORT_MODES = ('replace', 'upsert')
+
+# 賽季匯入時壓縮檔解壓後的總大小上限
+MAX_ARCHIVE_SIZE = 200 * 1024 * 1024
+
+# 一個英文字母+最多三位數字
+MEMBER_NUMBER_PATTERN = r'^[A-Za-z]\d{1,3}$'
+
+
+class MissingColumnsError(ValueError):
+    """上傳檔案缺少必要的列"""
+
+    def __init__(self, missing_columns, found_columns):
+        super().__init__(f'缺少必要的列: {", ".join(missing_columns)}')
+        self.missing_columns = missing_columns
+        self.found_columns = found_columns
+
+
+def map_score_columns(columns, partial=False):
+    """
+    找出每個必要欄位實際使用的列名，回傳 (column_map, missing_columns)
+    partial=True 時，找不到別名的欄位改用部分匹配（列名包含標準列名即可）
+    """
+    columns = list(columns)
+    column_map = {}
+    missing_columns = []
+    for required_col, possible_names in SCORE_COLUMN_MAPPINGS.items():
+        name = next((name for name in possible_names if name in columns), None)
+        if name is None and partial:
+            name = next((col for col in columns if required_col in col), None)
+        if name is None:
+            missing_columns.append(required_col)
+        else:
+            column_map[required_col] = name
+    return column_map, missing_columns
+
+
+def _clean_text(series):
+    """去除前後空白，空值維持為 None"""
+    text = series.astype(str).str.strip()
+    return text.where(series.notna(), None)
+
+
+def validate_score_frame(df):
+    """
+    整欄轉型並驗證成績資料（欄位需已更名為標準列名）
+    回傳 (records, errors)：records 為可直接寫入 Score 的字典列表，
+    errors 列出所有驗證失敗的行與欄位，行號為 df.index + 1
+    """
+    errors = []
+
+    def report(mask, column, message):
+        for index, value in df.loc[mask, column].items():
+            errors.append({
+                'row': int(index) + 1,
+                'column': column,
+                'value': None if pd.isna(value) else str(value),
+                'message': message.format(value=value)
+            })
+
+    out = pd.DataFrame(index=df.index)
+
+    # 會員編號格式檢查
+    member_number = df['會員編號'].astype(str).str.strip()
+    bad_number = df['會員編號'].isna() | ~member_number.str.match(MEMBER_NUMBER_PATTERN)
+    report(bad_number, '會員編號', '會員編號格式錯誤（應為一個英文字母+最多三位數字）: {value}')
+    out['member_number'] = member_number
+
+    for column, field in TEXT_COLUMNS.items():
+        out[field] = _clean_text(df[column])
+
+    # 整數欄位：無法轉換或含小數者皆視為錯誤
+    for column, field in INT_COLUMNS.items():
+        values = pd.to_numeric(df[column], errors='coerce')
+        bad = (df[column].notna() & values.isna()) | (values.notna() & (values % 1 != 0))
+        report(bad, column, f'{column}必須為整數')
+        out[field] = values.where(~bad).astype('Int64')
+
+    # 浮點數欄位：確保最多2位小數
+    for column, field in FLOAT_COLUMNS.items():
+        values = pd.to_numeric(df[column], errors='coerce')
+        bad = df[column].notna() & values.isna()
+        report(bad, column, f'{column}必須為數值')
+        out[field] = values.round(2)
+
+    if errors:
+        errors.sort(key=lambda e: e['row'])
+        return [], errors
+
+    out = out.astype(object).where(out.notna(), None)
+    return out.to_dict('records'), errors
+
+
+def bulk_insert_scores(tournament_id, records):
+    """以單一 executemany 批次寫入成績，不經過 ORM 物件"""
+    if not records:
+        return 0
+    db.session.execute(
+        Score.__table__.insert(),
+        [dict(record, tournament_id=tournament_id) for record in records]
+    )
+    return len(records)
+
+
+def parse_score_batches(batches, partial=False, progress=None):
+    """
+    逐批對應列名並驗證成績資料，回傳 (records, errors)
+    列名只在第一批檢查，缺少必要的列時拋出 MissingColumnsError；
+    progress(已處理行數) 會在每批處理完後呼叫
+    """
+    records = []
+    errors = []
+    rename = None
+    processed = 0
+    for df in batches:
+        if rename is None:
+            column_map, missing_columns = map_score_columns(df.columns, partial=partial)
+            if missing_columns:
+                raise MissingColumnsError(missing_columns, df.columns.tolist())
+            rename = {v: k for k, v in column_map.items()}
+        batch_records, batch_errors = validate_score_frame(df.rename(columns=rename))
+        errors.extend(batch_errors)
+        if not errors:
+            records.extend(batch_records)
+        processed += len(df)
+        if progress:
+            progress(processed)
+    if progress:
+        progress(processed, processed)
+    if errors:
+        return [], errors
+    return records, errors
+
+
+def load_member_index(member_numbers):
+    """以單一查詢取得會員編號到會員 ID 的對應"""
+    if not member_numbers:
+        return {}
+    rows = db.session.query(Member.member_number, Member.id)\
+        .filter(Member.member_number.in_(list(member_numbers)))\
+        .all()
+    return {member_number: member_id for member_number, member_id in rows}
+
+
+def create_missing_members(records, member_index):
+    """為會員索引中找不到的會員編號批次建立會員，回傳建立的數量"""
+    new_members = {}
+    for record in records:
+        member_number = record['member_number']
+        if member_number in member_index or member_number in new_members:
+            continue
+        new_members[member_number] = {
+            'account': member_number,
+            'chinese_name': record['chinese_name'] or member_number,
+            'english_name': record['full_name'],
+            'member_number': member_number,
+            'handicap': record['new_handicap']
+        }
+    if new_members:
+        db.session.execute(Member.__table__.insert(), list(new_members.values()))
+    return len(new_members)
+
+
+def find_duplicate_member_numbers(records):
+    """找出上傳資料中重複出現的會員編號"""
+    seen = set()
+    duplicates = []
+    for record in records:
+        member_number = record['member_number']
+        if member_number in seen and member_number not in duplicates:
+            duplicates.append(member_number)
+        seen.add(member_number)
+    return duplicates
+
+
+def replace_scores(tournament_id, records):
+    """刪除賽事的所有現有成績後批次寫入，回傳變動摘要"""
+    deleted = Score.query.filter_by(tournament_id=tournament_id).delete()
+    inserted = bulk_insert_scores(tournament_id, records)
+    return {'inserted': inserted, 'updated': 0, 'deleted': deleted, 'unchanged': 0}
+
+
+def _same_value(old, new):
+    if isinstance(old, float) and new is not None:
+        return round(old, 2) == new
+    return old == new
+
+
+def upsert_scores(tournament_id, records):
+    """
+    依 (tournament_id, member_number) 比對現有成績，
+    只新增、更新或刪除有變動的行，未變動的行保留原本的 id，回傳變動摘要
+    上傳資料中的會員編號需不重複
+    """
+    columns = [Score.id] + [getattr(Score, field) for field in SCORE_FIELDS]
+    existing = {}
+    stale_ids = []
+    for row in db.session.query(*columns).filter(Score.tournament_id == tournament_id):
+        if row.member_number in existing:
+            # 舊資料中的重複成績一併清除
+            stale_ids.append(row.id)
+        else:
+            existing[row.member_number] = row
+
+    inserts = []
+    updates = []
+    unchanged = 0
+    for record in records:
+        row = existing.pop(record['member_number'], None)
+        if row is None:
+            inserts.append(record)
+        elif all(_same_value(getattr(row, field), record[field]) for field in SCORE_FIELDS):
+            unchanged += 1
+        else:
+            updates.append(dict(record, score_id=row.id))
+    stale_ids.extend(row.id for row in existing.values())
+
+    bulk_insert_scores(tournament_id, inserts)
+    if updates:
+        db.session.execute(
+            Score.__table__.update().where(Score.id == bindparam('score_id')),
+            updates
+        )
+    if stale_ids:
+        db.session.execute(Score.__table__.delete().where(Score.id.in_(stale_ids)))
+
+    return {
+        'inserted': len(inserts),
+        'updated': len(updates),
+        'deleted': len(stale_ids),
+        'unchanged': unchanged
+    }
+
+
+def bump_score_revisions(tournament_ids=None):
+    """賽事的成績版本加一，作為成績列表的 ETag"""
+    tournaments = Tournament.__table__
+    update = tournaments.update().values(
+        score_revision=tournaments.c.score_revision + 1,
+        scores_updated_at=datetime.utcnow(),
+        updated_at=tournaments.c.updated_at  # 成績異動不算賽事本身的修改
+    )
+    if tournament_ids is not None:
+        update = update.where(tournaments.c.id.in_(list(tournament_ids)))
+    db.session.execute(update)
+
+
+def scores_changed(tournament_ids=None, member_numbers=None, years=None):
+    """
+    成績寫入後呼叫（與寫入在同一個交易中），更新依賴成績的衍生資料
+    tournament_ids 為 None 表示所有賽事；member_numbers 為受影響的會員，None 表示全部；
+    賽事已刪除或改期時，需以 years 指定受影響的年度
+    """
+    forget_score_uploads(tournament_ids)
+    bump_score_revisions(tournament_ids)
+    invalidate_tournament_results(tournament_ids)
+    if years is None and tournament_ids is not None:
+        years = season_years(tournament_ids)
+    refresh_member_standings(years, member_numbers)
+    refresh_tournament_stats(tournament_ids)
+
+
+def write_scores(tournament_id, records, mode='replace'):
+    """依上傳模式寫入成績，回傳變動摘要"""
+    # 原本與新上傳的會員都需要更新年度積分
+    affected = {row.member_number for row in
+                db.session.query(Score.member_number).filter_by(tournament_id=tournament_id).distinct()}
+    affected.update(record['member_number'] for record in records)
+    if mode == 'upsert':
+        changes = upsert_scores(tournament_id, records)
+    else:
+        changes = replace_scores(tournament_id, records)
+    scores_changed([tournament_id], member_numbers=affected)
+    return changes
+
+
+def _archive_member_name(info):
+    """未標示 UTF-8 的壓縮檔檔名多半是 Windows 繁中環境的 cp950 編碼"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    raw = info.filename.encode('cp437')
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('cp950', errors='replace')
+
+
+def collect_season_sources(upload):
+    """
+    把賽季上傳拆成多個成績來源 (name, filename, payload)：
+    壓縮檔中的每個成績檔各為一個來源，payload 為該檔案的內容；
+    單一活頁簿的每個工作表各為一個來源，payload 為 (活頁簿暫存檔路徑, 工作表名稱)，
+    活頁簿只寫入磁碟一次，由解析的行程以唯讀模式自行開啟並只讀取自己的工作表
+    name 為去除副檔名的檔名或工作表名稱，用來對應賽事，重複時拒絕匯入
+    """
+    sources = []
+    paths = {}
+    if upload.extension == '.zip':
+        total_size = 0
+        with zipfile.ZipFile(upload.buffer) as archive:
+            for info in archive.infolist():
+                path = _archive_member_name(info)
+                filename = posixpath.basename(path)
+                if info.is_dir() or '__MACOSX' in path or filename.startswith(('.', '~$')):
+                    continue
+                if not filename.lower().endswith(SCORE_UPLOAD_EXTENSIONS):
+                    continue
+                total_size += info.file_size
+                if total_size > MAX_ARCHIVE_SIZE:
+                    raise ValueError('壓縮檔解壓後超過大小上限')
+                name = os.path.splitext(filename)[0]
+                paths.setdefault(name, []).append(path)
+                sources.append((name, filename, archive.read(info)))
+    else:
+        sheet_names = upload.sheet_names()
+        workbook_path = upload.local_path() if sheet_names else None
+        for sheet_name in sheet_names:
+            paths.setdefault(sheet_name, []).append(sheet_name)
+            sources.append((sheet_name, upload.filename, (workbook_path, sheet_name)))
+
+    repeated = [f'{name}（{"、".join(found)}）' for name, found in paths.items() if len(found) > 1]
+    if repeated:
+        raise ValueError(f'有重複名稱的成績檔，無法對應賽事: {", ".join(repeated)}')
+    return sources
+
+
+def parse_score_source(source):
+    """
+    解析單一成績來源，回傳 (name, records, errors, missing_columns)
+    不使用資料庫與應用程式內容，可在子行程中執行
+    """
+    name, filename, payload = source
+    try:
+        if isinstance(payload, bytes):
+            upload = UploadedFile.from_bytes(filename, payload)
+            sheet_name = None
+        else:
+            path, sheet_name = payload
+            upload = UploadedFile.from_path(path, filename)
+        with upload:
+            records, errors = parse_score_batches(upload.iter_batches(sheet_name=sheet_name), partial=True)
+    except MissingColumnsError as e:
+        return name, [], [], e.missing_columns
+    except Exception as e:
+        error = {'row': None, 'column': None, 'value': None, 'message': f'無法讀取檔案: {str(e)}'}
+        return name, [], [error], []
+    return name, records, errors, []
+
+
+def _process_context():
+    """
+    子行程一律以 forkserver/spawn 啟動：在 gunicorn 的請求或背景工作執行緒中 fork
+    會複製其他執行緒持有的鎖與資料庫連線池，並不安全
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def parse_season_sources(sources, max_workers=None, progress=None):
+    """
+    以行程池平行解析多個成績來源，讓 pandas/openpyxl 的解析使用所有核心
+    回傳 {name: (records, errors, missing_columns)}；progress(已完成的來源數) 會在每個來源完成後呼叫
+    """
+    results = {}
+    workers = min(len(sources), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        # 只需一個行程時直接在本行程解析，不必啟動行程池
+        for source in sources:
+            name, records, errors, missing_columns = parse_score_source(source)
+            results[name] = (records, errors, missing_columns)
+            if progress:
+                progress(len(results), len(sources))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_process_context()) as pool:
+        futures = [pool.submit(parse_score_source, source) for source in sources]
+        for future in as_completed(futures):
+            name, records, errors, missing_columns = future.result()
+            results[name] = (records, errors, missing_columns)
+            if progress:
+                progress(len(results), len(sources))
+    return results
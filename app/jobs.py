@@ -0,0 +1,150 @@
+"""背景匯入工作：在本機執行緒池中處理上傳檔案，狀態存放在資料庫"""
+import os
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import ImportJob
+
+# 同時執行的匯入工作數量
+DEFAULT_WORKERS = 2
+
+# 執行行程回報存活的間隔，以及超過多久未回報即視為行程已停止（秒）
+HEARTBEAT_INTERVAL = 30
+DEFAULT_STALE_AFTER = 120
+
+# 尚未結束的工作狀態
+ACTIVE_STATUSES = ('pending', 'running')
+
+_executor = None
+_executor_lock = threading.Lock()
+_active_jobs = set()  # 本行程排入、尚未結束的工作
+_active_lock = threading.Lock()
+
+
+def wants_async(values):
+    """請求是否要求背景處理（?async=1 或表單欄位 async）"""
+    return str(values.get('async', '')).lower() in ('1', 'true', 'yes', 'on')
+
+
+def _get_executor(app):
+    global _executor
+    if _executor is None:
+        # 同時到達的請求只能有一個建立執行緒池與存活回報執行緒
+        with _executor_lock:
+            if _executor is None:
+                # 行程啟動後第一次排入工作時，先結束之前停止的行程留下的工作
+                expire_stale_jobs(stale_after=app.config.get('IMPORT_JOB_STALE_AFTER', DEFAULT_STALE_AFTER))
+                executor = ThreadPoolExecutor(
+                    max_workers=app.config.get('IMPORT_WORKERS', DEFAULT_WORKERS),
+                    thread_name_prefix='import-job'
+                )
+                threading.Thread(target=_heartbeat, args=(app,), name='import-job-heartbeat', daemon=True).start()
+                _executor = executor
+    return _executor
+
+
+def _heartbeat(app):
+    """定期更新本行程所有未結束工作的 heartbeat_at"""
+    stop = threading.Event()
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        with _active_lock:
+            job_ids = list(_active_jobs)
+        if not job_ids:
+            continue
+        try:
+            with app.app_context(), db.engine.begin() as conn:
+                conn.execute(ImportJob.__table__.update()
+                             .where(ImportJob.id.in_(job_ids))
+                             .values(heartbeat_at=datetime.utcnow()))
+        except Exception as e:
+            app.logger.error(f'更新匯入工作存活時間失敗: {str(e)}')
+
+
+def expire_stale_jobs(job_ids=None, stale_after=DEFAULT_STALE_AFTER):
+    """
+    執行行程已停止（重新啟動、被回收）的工作不會再更新狀態，
+    超過 stale_after 秒未回報存活的未結束工作標記為失敗
+    """
+    now = datetime.utcnow()
+    table = ImportJob.__table__
+    last_seen = db.func.coalesce(table.c.heartbeat_at, table.c.updated_at, table.c.created_at)
+    update = table.update()\
+        .where(table.c.status.in_(ACTIVE_STATUSES), last_seen < now - timedelta(seconds=stale_after))\
+        .values(status='failed', errors=['執行匯入的行程已停止，請重新上傳'], finished_at=now, updated_at=now)
+    if job_ids is not None:
+        update = update.where(table.c.id.in_(list(job_ids)))
+    with db.engine.begin() as conn:
+        return conn.execute(update).rowcount
+
+
+def update_job(job_id, **values):
+    """
+    以獨立連線更新工作狀態並立即提交，
+    不會影響匯入本身尚未提交的交易；同時記錄執行行程與存活時間
+    """
+    values['updated_at'] = values['heartbeat_at'] = datetime.utcnow()
+    values['worker_pid'] = os.getpid()
+    with db.engine.begin() as conn:
+        conn.execute(
+            ImportJob.__table__.update().where(ImportJob.id == job_id).values(**values)
+        )
+
+
+class JobProgress:
+    """傳給匯入函式的進度回報器"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def __call__(self, processed_rows, total_rows=None):
+        values = {'processed_rows': processed_rows}
+        if total_rows is not None:
+            values['total_rows'] = total_rows
+        update_job(self.job_id, **values)
+
+
+def enqueue_import(kind, upload, func, *args):
+    """
+    建立匯入工作並排入執行緒池
+    func(upload, *args, progress=...) 需回傳 (payload, status_code)
+    """
+    now = datetime.utcnow()
+    job = ImportJob(id=uuid.uuid4().hex, kind=kind, status='pending', filename=upload.filename,
+                    worker_pid=os.getpid(), heartbeat_at=now)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    executor = _get_executor(app)
+    with _active_lock:
+        _active_jobs.add(job.id)
+    executor.submit(_run_job, app, job.id, upload, func, args)
+    return job
+
+
+def _run_job(app, job_id, upload, func, args):
+    with app.app_context():
+        try:
+            update_job(job_id, status='running')
+            payload, status_code = func(upload, *args, progress=JobProgress(job_id))
+            update_job(
+                job_id,
+                status='succeeded' if status_code < 400 else 'failed',
+                result=payload,
+                errors=payload.get('errors') or payload.get('error_messages') or (
+                    [payload['error']] if 'error' in payload else []),
+                finished_at=datetime.utcnow()
+            )
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'匯入工作 {job_id} 失敗: {str(e)}')
+            app.logger.error(traceback.format_exc())
+            update_job(job_id, status='failed', errors=[str(e)], finished_at=datetime.utcnow())
+        finally:
+            with _active_lock:
+                _active_jobs.discard(job_id)
+            upload.close()
@@ -0,0 +1,271 @@
+"""
+會員版本：版本號的產生、差異儲存與重建，以及版本摘要目錄，皆與版本資料在同一個交易中維護
+
+每位會員的版本依版本號構成一條鏈，鏈上定期存放完整快照（is_snapshot），
+其餘版本只記錄與前一版本不同的欄位，被移除的欄位列在 UNSET_KEY 中
+"""
+from collections import defaultdict
+from itertools import groupby
+from datetime import datetime
+from sqlalchemy import func, case, select, and_
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Member, MemberVersion, MemberVersionCatalog, UploadRecord, VersionSequence
+from app.uploads import MEMBER_UPLOAD_KIND
+
+# 會員版本號使用的計數器名稱
+MEMBER_VERSION_SEQUENCE = 'member_version'
+
+# 每位會員每隔幾個版本存一次完整快照，重建任一版本最多讀取這麼多行
+SNAPSHOT_INTERVAL = 10
+
+# 差異中記錄被移除欄位的鍵
+UNSET_KEY = '$unset'
+
+# 比較兩個版本時檢查的欄位，依輸出順序排列
+COMPARE_FIELDS = ('handicap', 'is_guest', 'is_admin', 'chinese_name', 'english_name', 'department_class')
+
+
+def generate_version_number(today=None):
+    """
+    取得新的 YYYYMMDDNNNN 版本號，同一天內序號遞增，新的一天從 1 開始
+    以單一 UPDATE 遞增計數器行，該行在交易提交前保持鎖定，並行的寫入者會依序取得不同的號碼
+    """
+    today = today or datetime.now().strftime('%Y%m%d')
+    counter = VersionSequence.__table__
+    advance = counter.update()\
+        .where(counter.c.name == MEMBER_VERSION_SEQUENCE)\
+        .values(value=case((counter.c.day == today, counter.c.value + 1), else_=1), day=today)
+
+    if db.session.execute(advance).rowcount == 0:
+        # 尚未建立計數器時，從現有的最新版本接續
+        latest = db.session.query(func.max(MemberVersion.version)).scalar()
+        latest = str(latest) if latest is not None else None
+        start = int(latest[8:]) + 1 if latest and latest[:8] == today else 1
+        try:
+            with db.session.begin_nested():
+                db.session.execute(counter.insert().values(name=MEMBER_VERSION_SEQUENCE, day=today, value=start))
+        except IntegrityError:
+            # 其他寫入者已同時建立計數器
+            db.session.execute(advance)
+
+    value = db.session.execute(
+        select(counter.c.value).where(counter.c.name == MEMBER_VERSION_SEQUENCE)
+    ).scalar_one()
+    return int(f'{today}{value:04d}')
+
+
+def version_delta(old, new):
+    """new 相對於 old 的差異，值相等但型別不同（例如 1 與 True）也視為異動"""
+    delta = {key: value for key, value in new.items()
+             if key not in old or old[key] != value or type(old[key]) is not type(value)}
+    removed = [key for key in old if key not in new]
+    if removed:
+        delta[UNSET_KEY] = removed
+    return delta
+
+
+def apply_delta(data, delta):
+    result = dict(data)
+    for key in delta.get(UNSET_KEY, ()):
+        result.pop(key, None)
+    result.update((key, value) for key, value in delta.items() if key != UNSET_KEY)
+    return result
+
+
+def _fold(rows):
+    """依 (member_id, version) 排序的 (member_id, is_snapshot, data) 合併成每位會員的最終資料與鏈長"""
+    states = {}
+    for member_id, is_snapshot, data in rows:
+        if is_snapshot or member_id not in states:
+            states[member_id] = (data, 0)
+        else:
+            current, depth = states[member_id]
+            states[member_id] = (apply_delta(current, data), depth + 1)
+    return states
+
+
+def _chain_rows(member_ids, version=None):
+    """
+    從每位會員不晚於 version 的最近一次快照開始，到 version 為止的版本行
+    version 為 None 表示到最新版本
+    """
+    upper = [] if version is None else [MemberVersion.version <= str(version)]
+    base = db.session.query(MemberVersion.member_id, func.max(MemberVersion.version).label('version'))\
+        .filter(MemberVersion.member_id.in_(member_ids), MemberVersion.is_snapshot.is_(True), *upper)\
+        .group_by(MemberVersion.member_id)\
+        .subquery()
+    return db.session.query(MemberVersion.member_id, MemberVersion.is_snapshot, MemberVersion.data)\
+        .join(base, and_(MemberVersion.member_id == base.c.member_id, MemberVersion.version >= base.c.version))\
+        .filter(*upper)\
+        .order_by(MemberVersion.member_id, MemberVersion.version)
+
+
+def version_states(version, member_ids=None):
+    """重建指定版本中各會員的完整資料 {member_id: data}，member_ids 可限定會員"""
+    members = select(MemberVersion.member_id).where(MemberVersion.version == str(version))
+    if member_ids is not None:
+        members = members.where(MemberVersion.member_id.in_(list(member_ids)))
+    states = _fold(_chain_rows(members, version))
+    return {member_id: data for member_id, (data, _) in states.items()}
+
+
+def member_history(member_id):
+    """會員所有版本的 (版本行, 完整資料)，依版本號由舊到新"""
+    rows = MemberVersion.query.filter_by(member_id=member_id).order_by(MemberVersion.version).all()
+    history, data = [], None
+    for row in rows:
+        data = row.data if row.is_snapshot or data is None else apply_delta(data, row.data)
+        history.append((row, data))
+    return history
+
+
+def diff_versions(from_version, to_version, fields=COMPARE_FIELDS, offset=0, limit=None):
+    """
+    比較任兩個版本，回傳 (依會員編號排列的欄位異動中 offset 起的 limit 筆, 各欄位的異動筆數, 異動總筆數)
+    兩個版本涉及的會員版本行在同一個依 (會員編號, 會員ID, 版本號) 排序的查詢中串流取出，
+    每位會員從不晚於較舊版本的最近一次快照開始，逐行重建到較新版本，比較後即捨棄；
+    記憶體中只保留一位會員的資料與這一頁的異動
+    """
+    from_version, to_version = str(from_version), str(to_version)
+    low, high = sorted((from_version, to_version))
+    members = select(MemberVersion.member_id).where(MemberVersion.version.in_([from_version, to_version]))
+    # 較舊版本中已有資料的會員從該版本以前的最近快照開始，其餘會員從第一個版本（必為快照）開始
+    base = db.session.query(
+        MemberVersion.member_id,
+        func.coalesce(
+            func.max(case((and_(MemberVersion.is_snapshot.is_(True), MemberVersion.version <= low),
+                           MemberVersion.version))),
+            func.min(MemberVersion.version)
+        ).label('version')
+    ).filter(MemberVersion.member_id.in_(members), MemberVersion.version <= high)\
+        .group_by(MemberVersion.member_id)\
+        .subquery()
+    rows = db.session.query(Member.id, Member.member_number, Member.chinese_name,
+                            MemberVersion.version, MemberVersion.is_snapshot, MemberVersion.data)\
+        .join(MemberVersion, Member.id == MemberVersion.member_id)\
+        .join(base, and_(MemberVersion.member_id == base.c.member_id, MemberVersion.version >= base.c.version))\
+        .filter(MemberVersion.version <= high)\
+        .order_by(Member.member_number, Member.id, MemberVersion.version)
+
+    changes = []
+    counts = dict.fromkeys(fields, 0)
+    total = 0
+    for _, group in groupby(rows.yield_per(1000), key=lambda row: row.id):
+        data, old, new = None, {}, {}
+        for row in group:
+            data = row.data if row.is_snapshot or data is None else apply_delta(data, row.data)
+            if row.version == from_version:
+                old = data
+            if row.version == to_version:
+                new = data
+        for field in fields:
+            old_value, new_value = old.get(field), new.get(field)
+            if old_value != new_value:
+                counts[field] += 1
+                if total >= offset and (limit is None or total < offset + limit):
+                    changes.append({
+                        'member_number': row.member_number,
+                        'name': row.chinese_name,
+                        'field': field,
+                        'old': old_value,
+                        'new': new_value
+                    })
+                total += 1
+    return changes, counts, total
+
+
+def add_versions(version_number, entries, created_at=None):
+    """
+    寫入新版本 entries = [(member_id, data)]，與各會員目前最新的資料比較後只存差異，
+    鏈長達到 SNAPSHOT_INTERVAL 或尚無任何版本的會員存完整快照
+    """
+    db.session.flush()
+    entries = list(entries)
+    latest = _fold(_chain_rows([member_id for member_id, _ in entries]))
+    created_at = created_at or datetime.now()
+
+    rows = []
+    for member_id, data in entries:
+        previous = latest.get(member_id)
+        is_snapshot = previous is None or previous[1] + 1 >= SNAPSHOT_INTERVAL
+        rows.append({
+            'member_id': member_id,
+            'version': str(version_number),
+            'is_snapshot': is_snapshot,
+            'data': data if is_snapshot else version_delta(previous[0], data),
+            'created_at': created_at
+        })
+    db.session.bulk_insert_mappings(MemberVersion, rows)
+
+
+def delete_version(version):
+    """
+    刪除指定版本，回傳刪除的筆數
+    鏈上緊接在後的差異版本會失去比較基準，先改存為完整快照
+    """
+    version = str(version)
+    members = select(MemberVersion.member_id).where(MemberVersion.version == version)
+    following = db.session.query(MemberVersion.member_id, func.min(MemberVersion.version))\
+        .filter(MemberVersion.member_id.in_(members), MemberVersion.version > version)\
+        .group_by(MemberVersion.member_id)
+
+    by_version = defaultdict(list)
+    for member_id, next_version in following:
+        by_version[next_version].append(member_id)
+
+    updates = []
+    for next_version, member_ids in by_version.items():
+        states = version_states(next_version, member_ids)
+        rows = db.session.query(MemberVersion.id, MemberVersion.member_id)\
+            .filter(MemberVersion.version == next_version,
+                    MemberVersion.member_id.in_(member_ids),
+                    MemberVersion.is_snapshot.is_(False))
+        updates += [{'id': row.id, 'is_snapshot': True, 'data': states[row.member_id]} for row in rows]
+    if updates:
+        db.session.bulk_update_mappings(MemberVersion, updates)
+
+    deleted = MemberVersion.query.filter(MemberVersion.version == version).delete(synchronize_session=False)
+    refresh_version_catalog([version])
+    return deleted
+
+
+def refresh_version_catalog(versions=None):
+    """
+    重新計算指定版本的摘要，versions 為 None 表示所有版本
+    已沒有任何資料的版本會從目錄中移除；非來賓人數需由重建後的資料計算
+    """
+    db.session.flush()
+    catalog = MemberVersionCatalog.__table__
+    versions = None if versions is None else [str(version) for version in versions]
+
+    delete = catalog.delete()
+    if versions is not None:
+        delete = delete.where(catalog.c.version.in_(versions))
+    db.session.execute(delete)
+
+    source_upload = select(func.max(UploadRecord.id))\
+        .where(UploadRecord.kind == MEMBER_UPLOAD_KIND, UploadRecord.member_version == MemberVersion.version)\
+        .scalar_subquery()
+    query = db.session.query(
+        MemberVersion.version,
+        func.count(MemberVersion.id),
+        func.min(MemberVersion.created_at),
+        source_upload
+    )
+    if versions is not None:
+        query = query.filter(MemberVersion.version.in_(versions))
+    query = query.group_by(MemberVersion.version)
+
+    entries = []
+    for version, member_count, created_at, upload_id in query.all():
+        states = version_states(version)
+        entries.append({
+            'version': version,
+            'member_count': member_count,
+            'non_guest_count': sum(1 for data in states.values() if not data.get('is_guest', False)),
+            'created_at': created_at,
+            'upload_id': upload_id
+        })
+    if entries:
+        db.session.execute(catalog.insert(), entries)
@@ -36,9 +36,11 @@ class Member(db.Model):
 class Tournament(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
-    date = db.Column(db.Date, nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)
     location = db.Column(db.String(128), nullable=False)
     notes = db.Column(db.Text)
+    score_revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 成績每次異動加一
+    scores_updated_at = db.Column(db.DateTime)  # 成績最後異動時間
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -111,6 +113,12 @@ class Score(db.Model):
 
     tournament = db.relationship('Tournament', backref=db.backref('scores', lazy=True))
 
+    # GET /scores 依名次或總桿數的 keyset 分頁
+    __table_args__ = (
+        db.Index('ix_score_tournament_rank', 'tournament_id', 'rank', 'id'),
+        db.Index('ix_score_tournament_gross_score', 'tournament_id', 'gross_score', 'id'),
+    )
+
     def to_dict(self):
         """將成績數據轉換為字典格式"""
         return {
@@ -140,15 +148,48 @@ class Score(db.Model):
 class MemberVersion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     member_id = db.Column(db.Integer, db.ForeignKey('member.id'), nullable=False)
-    version = db.Column(db.String(11), nullable=False)  # YYYYMMDDNNN 格式
+    version = db.Column(db.String(12), nullable=False, index=True)  # YYYYMMDDNNNN 格式
+    is_snapshot = db.Column(db.Boolean, nullable=False, default=True, server_default='1')  # False 時 data 只含與前一版本不同的欄位
     data = db.Column(db.JSON, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     member = db.relationship('Member', backref=db.backref('versions', lazy=True))
+
+    # 每位會員在同一版本只有一筆資料
+    __table_args__ = (
+        db.Index('ix_member_version_member_id_version', 'member_id', 'version', unique=True),
+    )
     
     def __repr__(self):
         return f'<MemberVersion {self.member_id}-{self.version}>'
 
+class MemberVersionCatalog(db.Model):
+    """每個會員版本的摘要，版本新增或刪除時更新，版本列表不需逐版本統計"""
+    __tablename__ = 'member_version_catalog'
+
+    version = db.Column(db.String(12), primary_key=True)
+    member_count = db.Column(db.Integer, nullable=False, default=0)
+    non_guest_count = db.Column(db.Integer, nullable=False, default=0)  # 不含來賓
+    created_at = db.Column(db.DateTime)  # 該版本最早一筆資料的建立時間
+    upload_id = db.Column(db.Integer, db.ForeignKey('upload_records.id'))  # 產生此版本的名冊上傳
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'member_count': self.member_count,
+            'non_guest_count': self.non_guest_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'upload_id': self.upload_id
+        }
+
+class VersionSequence(db.Model):
+    """版本號計數器，每個序列一行；取號時以 UPDATE 鎖定該行，同一天內序號遞增"""
+    __tablename__ = 'version_sequence'
+
+    name = db.Column(db.String(32), primary_key=True)
+    day = db.Column(db.String(8), nullable=False)  # YYYYMMDD
+    value = db.Column(db.Integer, nullable=False)  # 當天最後發出的序號
+
 class YearlyChampion(db.Model):
     __tablename__ = 'yearly_champions'
     
@@ -157,7 +198,12 @@ class YearlyChampion(db.Model):
     tournament_name = db.Column(db.String(100), nullable=False)
     member_name = db.Column(db.String(100), nullable=False)
     total_strokes = db.Column(db.Integer, nullable=False)
-    date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    # 依賽事名稱查詢歷屆冠軍並依日期排序
+    __table_args__ = (
+        db.Index('ix_yearly_champions_tournament_name_date', 'tournament_name', 'date'),
+    )
 
     def to_dict(self):
         return {
@@ -209,3 +255,95 @@ class SystemConfig(db.Model):
             'value': self.value,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+class MemberSeasonStanding(db.Model):
+    __tablename__ = 'member_season_standings'
+
+    year = db.Column(db.Integer, primary_key=True)
+    member_number = db.Column(db.String(4), primary_key=True)
+    participation_count = db.Column(db.Integer, nullable=False, default=0)
+    total_points = db.Column(db.Integer, nullable=False, default=0)
+    gross_score_sum = db.Column(db.Integer, nullable=False, default=0)
+    gross_score_count = db.Column(db.Integer, nullable=False, default=0)
+    handicap_sum = db.Column(db.Float, nullable=False, default=0)  # 新差點加總
+    handicap_count = db.Column(db.Integer, nullable=False, default=0)
+    first_score_id = db.Column(db.Integer)  # 該年度第一筆成績，提供姓名與同分時的排序
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # 年度總成績依總積分排序分頁
+    __table_args__ = (
+        db.Index('ix_member_season_standings_year_points', 'year', 'total_points'),
+    )
+
+class TournamentStats(db.Model):
+    __tablename__ = 'tournament_stats'
+
+    tournament_id = db.Column(db.Integer, primary_key=True)  # 賽事刪除時由成績異動一併清除
+    field_size = db.Column(db.Integer, nullable=False, default=0)  # 參賽人數
+    avg_gross_score = db.Column(db.Float)
+    best_gross_score = db.Column(db.Integer)
+    avg_net_score = db.Column(db.Float)
+    best_net_score = db.Column(db.Float)
+    avg_handicap_change = db.Column(db.Float)
+    handicap_decreased = db.Column(db.Integer, nullable=False, default=0)  # 差點減少的人數
+    handicap_increased = db.Column(db.Integer, nullable=False, default=0)  # 差點增加的人數
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'field_size': self.field_size,
+            'avg_gross_score': round(self.avg_gross_score, 2) if self.avg_gross_score is not None else None,
+            'best_gross_score': self.best_gross_score,
+            'avg_net_score': round(self.avg_net_score, 2) if self.avg_net_score is not None else None,
+            'best_net_score': round(self.best_net_score, 2) if self.best_net_score is not None else None,
+            'avg_handicap_change': round(self.avg_handicap_change, 2) if self.avg_handicap_change is not None else None,
+            'handicap_decreased': self.handicap_decreased,
+            'handicap_increased': self.handicap_increased,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(32), nullable=False)  # score_upload / score_import / season_import / member_upload
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending/running/succeeded/failed
+    filename = db.Column(db.String(255))
+    total_rows = db.Column(db.Integer)
+    processed_rows = db.Column(db.Integer, default=0)
+    result = db.Column(db.JSON)
+    errors = db.Column(db.JSON)
+    worker_pid = db.Column(db.Integer)  # 執行此工作的行程
+    heartbeat_at = db.Column(db.DateTime)  # 執行行程最後一次回報仍存活的時間
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'filename': self.filename,
+            'total_rows': self.total_rows,
+            'processed_rows': self.processed_rows or 0,
+            'result': self.result,
+            'errors': self.errors or [],
+            'worker_pid': self.worker_pid,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class UploadRecord(db.Model):
+    __tablename__ = 'upload_records'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)  # score_upload / score_import / member_upload
+    content_hash = db.Column(db.String(64), nullable=False, index=True)  # SHA-256
+    filename = db.Column(db.String(255))
+    row_count = db.Column(db.Integer)
+    tournament_id = db.Column(db.Integer, index=True)  # 成績上傳對應的賽事
+    member_version = db.Column(db.String(12))  # 名冊上傳產生的版本號
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,62 @@
+"""Keyset 分頁：以上一頁最後一行的排序值與 id 作為游標，任何一頁的查詢成本都相同"""
+import base64
+import json
+from sqlalchemy import tuple_
+
+# 每頁筆數上限
+MAX_PAGE_SIZE = 500
+
+
+class CursorError(ValueError):
+    """游標格式錯誤或與目前的排序方式不符"""
+
+
+def encode_cursor(sort, value, row_id):
+    payload = json.dumps({'s': sort, 'v': value, 'id': row_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """回傳 (排序值, id)，排序值為 None 表示已進入排序欄位為空值的部分"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, row_id = payload['v'], int(payload['id'])
+    except (ValueError, TypeError, KeyError):
+        raise CursorError('無效的分頁游標')
+    if payload.get('s') != sort:
+        raise CursorError('分頁游標與排序方式不符')
+    return value, row_id
+
+
+def keyset_page(query, column, id_column, sort, limit, cursor=None, descending=False):
+    """
+    依 (column, id) 排序取出一頁，排序欄位為空值的行排在最後（依 id 排序）
+    回傳 (rows, next_cursor)；查詢條件與 (篩選欄位, column, id) 複合索引的順序一致
+    """
+    value, last_id = decode_cursor(cursor, sort) if cursor else (None, None)
+    in_nulls = cursor is not None and value is None
+
+    rows = []
+    if not in_nulls:
+        page = query.filter(column.isnot(None))
+        if cursor is not None:
+            if descending:
+                page = page.filter(tuple_(column, id_column) < tuple_(value, last_id))
+            else:
+                page = page.filter(tuple_(column, id_column) > tuple_(value, last_id))
+        order = (column.desc(), id_column.desc()) if descending else (column, id_column)
+        rows = page.order_by(*order).limit(limit + 1).all()
+
+    if len(rows) <= limit:
+        # 非空值的行已取完，接著取排序欄位為空值的行
+        nulls = query.filter(column.is_(None))
+        if in_nulls:
+            nulls = nulls.filter(id_column > last_id)
+        rows += nulls.order_by(id_column).limit(limit + 1 - len(rows)).all()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, getattr(last, column.key), getattr(last, id_column.key))
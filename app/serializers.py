@@ -0,0 +1,103 @@
+"""
+列表端點的序列化：只查詢需要的欄位，以預先產生的 row → dict 函式轉換，
+不建立 ORM 物件也不逐欄呼叫 to_dict；支援 ?fields= 只回傳部分欄位
+"""
+from functools import lru_cache
+from sqlalchemy import null
+from app.models import Score, Member, Tournament, MemberVersion
+
+# 欄位轉換樣板，{v} 代表該欄位的值
+ROUND_2 = 'None if {v} is None else round(float({v}), 2)'
+ISOFORMAT = '{v}.isoformat() if {v} else None'
+
+
+class FieldSetError(ValueError):
+    """fields 參數包含不支援的欄位"""
+
+
+class RowSerializer:
+    """
+    fields 依輸出順序列出 (名稱, 欄位運算式, 轉換樣板)，樣板為 None 表示直接輸出
+    hidden 列出只供查詢使用、不能以 ?fields= 要求輸出的欄位
+    查詢時以 columns() 取得要 SELECT 的欄位，再以 compile() 產生的函式轉換每一行
+    """
+
+    def __init__(self, fields, hidden=()):
+        self.fields = {name: (column, template) for name, column, template in fields}
+        self.names = tuple(name for name in self.fields if name not in hidden)
+        self._compile = lru_cache(maxsize=64)(self._build)
+
+    def parse_fields(self, value):
+        """解析 ?fields=a,b，未指定時回傳所有欄位"""
+        if not value:
+            return self.names
+        names = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.names]
+        if unknown or not names:
+            raise FieldSetError(f'不支援的欄位: {", ".join(unknown)}' if unknown else '未指定欄位')
+        return names
+
+    def select_names(self, names, extra=()):
+        """要 SELECT 的欄位名稱：輸出欄位加上查詢本身需要的欄位（例如分頁用的排序欄位與 id）"""
+        return tuple(dict.fromkeys(tuple(names) + tuple(extra)))
+
+    def columns(self, select_names):
+        return [self.fields[name][0].label(name) for name in select_names]
+
+    def compile(self, select_names, names=None):
+        """回傳把 SELECT 結果（依 select_names 排列）轉成只含 names 欄位的 dict 的函式"""
+        return self._compile(tuple(select_names), tuple(names or select_names))
+
+    def _build(self, select_names, names):
+        position = {name: i for i, name in enumerate(select_names)}
+        lines = ['def row_to_dict(row):']
+        items = []
+        for i, name in enumerate(names):
+            lines.append(f'    v{i} = row[{position[name]}]')
+            template = self.fields[name][1]
+            items.append(f'{name!r}: {template.format(v=f"v{i}") if template else f"v{i}"}')
+        lines.append('    return {' + ', '.join(items) + '}')
+        namespace = {}
+        exec('\n'.join(lines), {}, namespace)
+        return namespace['row_to_dict']
+
+
+score_serializer = RowSerializer([
+    ('id', Score.id, None),
+    ('tournament_id', Score.tournament_id, None),
+    ('member_number', Score.member_number, None),
+    ('full_name', Score.full_name, None),
+    ('chinese_name', Score.chinese_name, None),
+    ('rank', Score.rank, None),
+    ('gross_score', Score.gross_score, None),
+    ('previous_handicap', Score.previous_handicap, ROUND_2),
+    ('net_score', Score.net_score, ROUND_2),
+    ('handicap_change', Score.handicap_change, ROUND_2),
+    ('new_handicap', Score.new_handicap, ROUND_2),
+    ('points', Score.points, None),
+])
+
+tournament_serializer = RowSerializer([
+    ('id', Tournament.id, None),
+    ('name', Tournament.name, None),
+    ('date', Tournament.date, "{v}.strftime('%Y-%m-%d')"),
+    ('location', Tournament.location, None),
+    ('notes', Tournament.notes, None),
+    ('created_at', Tournament.created_at, ISOFORMAT),
+    ('updated_at', Tournament.updated_at, ISOFORMAT),
+])
+
+# 會員列表：基本資料來自 Member，差點來自指定版本的資料
+# 版本資料以差異儲存，handicap 先輸出 None，由 get_members 依隱藏的 member_id 以重建後的資料填入
+member_list_serializer = RowSerializer([
+    ('id', Member.id, None),
+    ('account', Member.account, None),
+    ('chinese_name', Member.chinese_name, None),
+    ('english_name', Member.english_name, None),
+    ('department_class', Member.department_class, None),
+    ('member_number', Member.member_number, None),
+    ('is_guest', Member.is_guest, None),
+    ('is_admin', Member.is_admin, None),
+    ('handicap', null(), None),
+    ('member_id', MemberVersion.member_id, None),
+], hidden=('member_id',))
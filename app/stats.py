@@ -0,0 +1,271 @@
+"""年度成績統計：在資料庫中彙總，不逐筆載入 Score 物件"""
+from datetime import datetime, date
+from sqlalchemy import func, extract, literal, cast, or_, case, Integer, Float
+from app import db
+from app.models import Score, Tournament, MemberSeasonStanding, TournamentStats
+
+
+def season_years(tournament_ids):
+    """賽事所屬的年度"""
+    rows = db.session.query(Tournament.date).filter(Tournament.id.in_(list(tournament_ids)))
+    return {row.date.year for row in rows}
+
+
+def refresh_member_standings(years=None, member_numbers=None):
+    """
+    重新計算指定年度（與會員）的年度積分榜，與成績寫入在同一個交易中執行
+    years 為 None 表示所有年度，member_numbers 為 None 表示該年度所有會員
+    """
+    db.session.flush()
+    standings = MemberSeasonStanding.__table__
+    year = extract('year', Tournament.date)
+
+    delete = standings.delete()
+    if years is not None:
+        delete = delete.where(standings.c.year.in_(list(years)))
+    if member_numbers is not None:
+        delete = delete.where(standings.c.member_number.in_(list(member_numbers)))
+    db.session.execute(delete)
+
+    select = db.session.query(
+        year,
+        Score.member_number,
+        func.count(Score.id),
+        func.coalesce(func.sum(Score.points), 0),
+        func.coalesce(func.sum(Score.gross_score), 0),
+        func.count(Score.gross_score),
+        func.coalesce(func.sum(Score.new_handicap), 0),
+        func.count(Score.new_handicap),
+        func.min(Score.id),
+        literal(datetime.utcnow())
+    ).join(Tournament, Score.tournament_id == Tournament.id)
+    if years is not None:
+        select = select.filter(year.in_(list(years)))
+    if member_numbers is not None:
+        select = select.filter(Score.member_number.in_(list(member_numbers)))
+    select = select.group_by(year, Score.member_number)
+
+    db.session.execute(standings.insert().from_select([
+        'year', 'member_number', 'participation_count', 'total_points',
+        'gross_score_sum', 'gross_score_count', 'handicap_sum', 'handicap_count', 'first_score_id', 'updated_at'
+    ], select.statement))
+
+
+def column_percentiles(column, condition, fractions):
+    """
+    以單一查詢計算欄位的百分位數（連續插值，同 percentile_cont），空值不計
+    PostgreSQL 直接使用 percentile_cont；其他資料庫以視窗函式取出相鄰的兩個值再插值
+    回傳與 fractions 對應的列表，沒有資料時為 None
+    """
+    if db.engine.dialect.name == 'postgresql':
+        row = db.session.query(*[
+            func.percentile_cont(p).within_group(column.asc()) for p in fractions
+        ]).filter(condition, column.isnot(None)).one()
+        return [float(v) if v is not None else None for v in row]
+
+    ranked = db.session.query(
+        column.label('value'),
+        func.row_number().over(order_by=column).label('position'),
+        func.count().over().label('total')
+    ).filter(condition, column.isnot(None)).subquery()
+    # 每個百分位需要第 floor(k) 與 floor(k)+1 個值，k = (總數 - 1) * p（從 0 起算）
+    # SQLite 不一定內建 floor()，k 不為負數，以 CAST 截斷即可；MySQL 的 CAST 會四捨五入，須用 FLOOR
+    wanted = []
+    for p in fractions:
+        k = (ranked.c.total - 1) * p
+        offset = cast(k, Integer) if db.engine.dialect.name == 'sqlite' else func.floor(k)
+        wanted += [ranked.c.position == offset + 1, ranked.c.position == offset + 2]
+    rows = db.session.query(ranked.c.position, ranked.c.value, ranked.c.total).filter(or_(*wanted)).all()
+    if not rows:
+        return [None] * len(fractions)
+
+    values = {position: value for position, value, _ in rows}
+    total = rows[0].total
+    result = []
+    for p in fractions:
+        k = (total - 1) * p
+        low = int(k)
+        lower = values[low + 1]
+        upper = values.get(low + 2, lower)
+        result.append(float(lower + (upper - lower) * (k - low)))
+    return result
+
+
+def refresh_tournament_stats(tournament_ids=None):
+    """
+    重新計算賽事統計快照，與成績寫入在同一個交易中執行
+    tournament_ids 為 None 表示所有賽事；沒有成績的賽事不保留快照
+    """
+    db.session.flush()
+    snapshots = TournamentStats.__table__
+
+    delete = snapshots.delete()
+    if tournament_ids is not None:
+        delete = delete.where(snapshots.c.tournament_id.in_(list(tournament_ids)))
+    db.session.execute(delete)
+
+    select = db.session.query(
+        Score.tournament_id,
+        func.count(Score.id),
+        func.avg(Score.gross_score),
+        func.min(Score.gross_score),
+        func.avg(Score.net_score),
+        func.min(Score.net_score),
+        func.avg(Score.handicap_change),
+        func.count(case((Score.handicap_change < 0, 1))),
+        func.count(case((Score.handicap_change > 0, 1))),
+        literal(datetime.utcnow())
+    ).join(Tournament, Score.tournament_id == Tournament.id)
+    if tournament_ids is not None:
+        select = select.filter(Score.tournament_id.in_(list(tournament_ids)))
+    select = select.group_by(Score.tournament_id)
+
+    db.session.execute(snapshots.insert().from_select([
+        'tournament_id', 'field_size', 'avg_gross_score', 'best_gross_score', 'avg_net_score',
+        'best_net_score', 'avg_handicap_change', 'handicap_decreased', 'handicap_increased', 'updated_at'
+    ], select.statement))
+
+
+def full_season_year(tournament_ids):
+    """所選賽事剛好是某年度的全部賽事時回傳該年度，否則回傳 None（不存在的賽事ID也視為不符）"""
+    selected = {int(i) for i in tournament_ids}
+    years = season_years(selected)
+    if len(years) != 1:
+        return None
+    year = years.pop()
+    season = {row.id for row in db.session.query(Tournament.id).filter(
+        Tournament.date >= date(year, 1, 1), Tournament.date < date(year + 1, 1, 1)
+    )}
+    return year if season == selected else None
+
+
+def _filter_gender(query, member_number, gender):
+    """女性會員編號以 F 開頭"""
+    if gender == 'F':
+        return query.filter(member_number.like('F%'))
+    if gender == 'M':
+        return query.filter(~member_number.like('F%'))
+    return query
+
+
+def standings_totals(year, gender=None):
+    """從年度積分榜讀取各會員彙總，欄位同 member_season_totals"""
+    s = MemberSeasonStanding
+    query = db.session.query(
+        s.member_number.label('member_number'),
+        s.participation_count.label('participation_count'),
+        s.total_points.label('total_points'),
+        (cast(s.gross_score_sum, Float) / func.nullif(s.gross_score_count, 0)).label('avg_gross_score'),
+        (s.handicap_sum / func.nullif(s.handicap_count, 0)).label('avg_handicap'),
+        s.first_score_id.label('first_score_id')
+    ).filter(s.year == year)
+    return _filter_gender(query, s.member_number, gender).subquery()
+
+
+def member_season_totals(tournament_ids, gender=None):
+    """以 GROUP BY 計算所選賽事中每位會員的參賽次數、總積分、平均總桿數、平均差點與第一筆成績"""
+    query = db.session.query(
+        Score.member_number.label('member_number'),
+        func.count(Score.id).label('participation_count'),
+        func.coalesce(func.sum(Score.points), 0).label('total_points'),
+        func.avg(Score.gross_score).label('avg_gross_score'),
+        func.avg(Score.new_handicap).label('avg_handicap'),
+        func.min(Score.id).label('first_score_id')
+    ).filter(Score.tournament_id.in_(tournament_ids))
+    return _filter_gender(query, Score.member_number, gender).group_by(Score.member_number).subquery()
+
+
+def tournament_breakdown(tournament_ids, member_numbers=None):
+    """所選賽事的個別成績明細，只查詢需要的欄位，依寫入順序回傳；可限定會員"""
+    query = db.session.query(
+        Score.member_number, Tournament.name.label('tournament_name'), Score.new_handicap,
+        Score.gross_score, Score.net_score, Score.rank, Score.points
+    ).join(Tournament, Score.tournament_id == Tournament.id)\
+        .filter(Score.tournament_id.in_(tournament_ids))
+    if member_numbers is not None:
+        query = query.filter(Score.member_number.in_(member_numbers))
+    return query.order_by(Score.id).all()
+
+
+def annual_stats(tournament_ids, gender=None, limit=None, offset=0, include_tournaments=True):
+    """
+    年度總成績：每位會員的彙總與個別賽事明細，依總積分降序排列（同分依第一筆成績的順序），
+    回傳 (該頁會員, 會員總數)
+    選取整個年度的賽事時直接讀取與成績寫入同步維護的年度積分榜，否則在資料庫中以 GROUP BY 計算；
+    排序與分頁都在資料庫中完成，姓名取自每位會員的第一筆成績，明細只查詢這一頁的會員
+    """
+    year = full_season_year(tournament_ids)
+    totals = standings_totals(year, gender) if year is not None else member_season_totals(tournament_ids, gender)
+
+    total = db.session.query(func.count()).select_from(totals).scalar()
+    query = db.session.query(totals, Score.chinese_name, Score.full_name)\
+        .join(Score, Score.id == totals.c.first_score_id)\
+        .order_by(totals.c.total_points.desc(), totals.c.first_score_id)\
+        .offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+
+    result = [{
+        'member_number': row.member_number,
+        'name': row.chinese_name,
+        'gender': 'F' if row.member_number.startswith('F') else 'M',
+        'full_name': row.full_name,
+        'avg_gross_score': round(float(row.avg_gross_score or 0), 1),
+        'participation_count': row.participation_count,
+        'avg_handicap': round(float(row.avg_handicap or 0), 1),
+        'total_points': int(row.total_points)
+    } for row in query]
+
+    if include_tournaments and result:
+        selected = {}
+        for member_stats in result:
+            member_stats['tournaments'] = selected[member_stats['member_number']] = []
+        paged = limit is not None or offset
+        for row in tournament_breakdown(tournament_ids, list(selected) if paged else None):
+            if row.member_number not in selected:
+                continue
+            selected[row.member_number].append({
+                'tournament_name': row.tournament_name,
+                'new_handicap': row.new_handicap,
+                'gross_score': row.gross_score,
+                'net_score': row.net_score,
+                'rank': row.rank,
+                'points': row.points
+            })
+        for tournaments in selected.values():
+            tournaments.sort(key=lambda x: x['tournament_name'])
+    return result, total
+
+
+def handicap_series(tournaments, start=None, end=None, member_numbers=None):
+    """
+    各會員的新差點時間序列：以單一查詢依 (會員, 賽事日期) 排序，逐行串流組成精簡陣列
+    tournaments 為該日期範圍內依日期排列的賽事，回傳
+    {member_number: {'tournaments': [在 tournaments 中的索引...], 'handicaps': [新差點...]}}
+    """
+    index = {t.id: i for i, t in enumerate(tournaments)}
+
+    query = db.session.query(Score.member_number, Score.tournament_id, Score.new_handicap)\
+        .join(Tournament, Score.tournament_id == Tournament.id)\
+        .filter(Score.new_handicap.isnot(None))
+    if start is not None:
+        query = query.filter(Tournament.date >= start)
+    if end is not None:
+        query = query.filter(Tournament.date <= end)
+    if member_numbers:
+        query = query.filter(Score.member_number.in_(member_numbers))
+    query = query.order_by(Score.member_number, Tournament.date, Tournament.id, Score.id)
+
+    series = {}
+    current_member, current = None, None
+    for member_number, tournament_id, new_handicap in query.yield_per(1000):
+        position = index.get(tournament_id)
+        if position is None:
+            # 查詢期間新增的賽事
+            continue
+        if member_number != current_member:
+            current_member = member_number
+            current = series[member_number] = {'tournaments': [], 'handicaps': []}
+        current['tournaments'].append(position)
+        current['handicaps'].append(round(new_handicap, 2))
+    return series
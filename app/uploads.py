@@ -0,0 +1,254 @@
+"""上傳檔案讀取：直接從請求串流解析，不落地存檔"""
+import codecs
+import hashlib
+import io
+import os
+import tempfile
+import pandas as pd
+from openpyxl import load_workbook
+from werkzeug.datastructures import FileStorage
+from app import db
+from app.models import UploadRecord
+
+# 超過此大小才會轉存到暫存檔，其餘都留在記憶體中
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+# 從請求串流複製時每次讀取的位元組數
+COPY_CHUNK_SIZE = 64 * 1024
+# 每批回傳的資料行數
+DEFAULT_BATCH_SIZE = 500
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+CSV_EXTENSIONS = ('.csv', '.tsv')
+SCORE_UPLOAD_EXTENSIONS = EXCEL_EXTENSIONS + CSV_EXTENSIONS
+
+# 上傳紀錄的種類
+SCORE_UPLOAD_KINDS = ('score_upload', 'score_import')
+MEMBER_UPLOAD_KIND = 'member_upload'
+
+# 判斷 CSV 編碼與分隔符號時讀取的位元組數
+CSV_SAMPLE_SIZE = 64 * 1024
+
+
+def clean_column_name(name, position):
+    """清理列名（移除空白和特殊字符），空白列名比照 pandas 命名"""
+    if name is None:
+        return f'Unnamed: {position}'
+    return str(name).replace('\ufeff', '').replace('\u3000', ' ').strip()
+
+
+class UploadedFile:
+    """
+    上傳檔案的唯讀緩衝區
+    內容從請求串流複製到 SpooledTemporaryFile，小檔案完全在記憶體中處理，
+    複製時計算 SHA-256 (content_hash)，
+    讀取時以批次 DataFrame 回傳，索引為資料行的順序（從 0 開始，不含標題列）
+    """
+
+    def __init__(self, file, max_size=SPOOL_MAX_SIZE):
+        self.filename = file.filename or ''
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=max_size)
+        # 複製時一併計算內容雜湊，用來判斷是否為重複上傳
+        digest = hashlib.sha256()
+        while True:
+            chunk = file.stream.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            self.buffer.write(chunk)
+        self.content_hash = digest.hexdigest()
+        self.buffer.seek(0)
+        self._path = None
+
+    @classmethod
+    def from_bytes(cls, filename, data):
+        """由記憶體中的內容建立（例如壓縮檔中的單一檔案）"""
+        return cls(FileStorage(stream=io.BytesIO(data), filename=filename))
+
+    @classmethod
+    def from_path(cls, path, filename=None):
+        """直接讀取磁碟上的檔案，不複製內容也不計算 content_hash（例如子行程讀取 local_path()）"""
+        upload = cls.__new__(cls)
+        upload.filename = filename or os.path.basename(path)
+        upload.buffer = open(path, 'rb')
+        upload.content_hash = None
+        upload._path = None
+        return upload
+
+    @property
+    def extension(self):
+        return os.path.splitext(self.filename)[1].lower()
+
+    def local_path(self):
+        """
+        內容在磁碟上的路徑，第一次呼叫時寫入暫存檔，close() 時刪除
+        供子行程自行開啟檔案，不必把整份內容傳給每個子行程
+        """
+        if self._path is None:
+            fd, path = tempfile.mkstemp(suffix=self.extension)
+            with os.fdopen(fd, 'wb') as target:
+                self.buffer.seek(0)
+                while True:
+                    chunk = self.buffer.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+            self.buffer.seek(0)
+            self._path = path
+        return self._path
+
+    def close(self):
+        self.buffer.close()
+        if self._path is not None:
+            os.remove(self._path)
+            self._path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def iter_batches(self, batch_size=DEFAULT_BATCH_SIZE, sheet_name=None):
+        """逐批讀取資料行，sheet_name 未指定時讀取第一個工作表"""
+        self.buffer.seek(0)
+        if self.extension == '.xls':
+            # openpyxl 不支援舊版格式，交給 pandas 處理
+            df = pd.read_excel(self.buffer, sheet_name=sheet_name or 0)
+            df.columns = [clean_column_name(c, i) for i, c in enumerate(df.columns)]
+            yield df
+            return
+        if self.extension in CSV_EXTENSIONS:
+            yield from self._iter_csv_batches(batch_size)
+            return
+        yield from self._iter_xlsx_batches(batch_size, sheet_name)
+
+    def _sniff_csv(self):
+        """
+        依檔案開頭判斷編碼與分隔符號：
+        優先使用 UTF-8（含 BOM），解碼失敗時改用 Excel 繁中版常見的 cp950
+        """
+        sample = self.buffer.read(CSV_SAMPLE_SIZE)
+        self.buffer.seek(0)
+        try:
+            text = codecs.getincrementaldecoder('utf-8-sig')().decode(sample, final=False)
+            encoding = 'utf-8-sig'
+        except UnicodeDecodeError:
+            text = sample.decode('cp950', errors='replace')
+            encoding = 'cp950'
+        header = text.splitlines()[0] if text else ''
+        if self.extension == '.tsv' or ('\t' in header and ',' not in header):
+            return encoding, '\t'
+        return encoding, ','
+
+    def _iter_csv_batches(self, batch_size):
+        encoding, sep = self._sniff_csv()
+        # 全部以文字讀入，由呼叫端整欄轉型，避免編號或姓名被誤判為數字
+        reader = pd.read_csv(self.buffer, sep=sep, encoding=encoding, dtype=str, chunksize=batch_size)
+        yielded = False
+        for df in reader:
+            df.columns = [clean_column_name(c, i) for i, c in enumerate(df.columns)]
+            yielded = True
+            yield df
+        if not yielded:
+            # 只有標題列時也要回傳欄位，讓呼叫端能檢查列名
+            self.buffer.seek(0)
+            df = pd.read_csv(self.buffer, sep=sep, encoding=encoding, dtype=str, nrows=0)
+            df.columns = [clean_column_name(c, i) for i, c in enumerate(df.columns)]
+            yield df
+
+    def sheet_names(self):
+        """活頁簿中所有工作表的名稱，依活頁簿中的順序（唯讀模式，不讀取工作表內容）"""
+        self.buffer.seek(0)
+        if self.extension == '.xls':
+            return pd.ExcelFile(self.buffer).sheet_names
+        workbook = load_workbook(self.buffer, read_only=True)
+        try:
+            return [sheet.title for sheet in workbook.worksheets]
+        finally:
+            workbook.close()
+
+    def _iter_xlsx_batches(self, batch_size, sheet_name=None):
+        workbook = load_workbook(self.buffer, read_only=True, data_only=True)
+        try:
+            sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+            yield from self._iter_sheet_batches(sheet, batch_size)
+        finally:
+            workbook.close()
+
+    def _iter_sheet_batches(self, sheet, batch_size):
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+
+        header = None
+        for row in rows:
+            if any(value is not None for value in row):
+                header = [clean_column_name(c, i) for i, c in enumerate(row)]
+                break
+        if header is None:
+            return
+
+        width = len(header)
+        batch = []
+        start = 0
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield self._frame(batch, header, start)
+                start += len(batch)
+                batch = []
+        if batch or start == 0:
+            yield self._frame(batch, header, start)
+
+    @staticmethod
+    def _frame(rows, header, start):
+        df = pd.DataFrame.from_records(rows, columns=header)
+        df.index = pd.RangeIndex(start, start + len(rows))
+        return df
+
+    def read_frame(self):
+        """讀取整份資料為單一 DataFrame"""
+        batches = list(self.iter_batches())
+        if len(batches) == 1:
+            return batches[0]
+        return pd.concat(batches)
+
+
+def find_duplicate_upload(kind, content_hash, tournament_id=None):
+    """
+    若內容與該對象最近一次上傳完全相同，回傳該次的上傳紀錄
+    （賽事成績以 tournament_id 區分，會員名冊則只看最近一次名冊上傳）
+    """
+    kinds = SCORE_UPLOAD_KINDS if kind in SCORE_UPLOAD_KINDS else (kind,)
+    latest = UploadRecord.query\
+        .filter(UploadRecord.kind.in_(kinds), UploadRecord.tournament_id == tournament_id)\
+        .order_by(UploadRecord.id.desc())\
+        .first()
+    if latest and latest.kind == kind and latest.content_hash == content_hash:
+        return latest
+    return None
+
+
+def record_upload(kind, upload, row_count, tournament_id=None, member_version=None):
+    """記錄上傳內容的雜湊與寫入結果，與資料寫入在同一個交易中提交"""
+    db.session.add(UploadRecord(
+        kind=kind,
+        content_hash=upload.content_hash,
+        filename=upload.filename,
+        row_count=row_count,
+        tournament_id=tournament_id,
+        member_version=str(member_version) if member_version is not None else None
+    ))
+
+
+def forget_score_uploads(tournament_ids=None):
+    """
+    成績被其他方式修改後，之前的上傳紀錄不再代表現況，
+    需清除才不會把之後的相同上傳誤判為重複
+    """
+    query = UploadRecord.query.filter(UploadRecord.kind.in_(SCORE_UPLOAD_KINDS))
+    if tournament_ids is not None:
+        query = query.filter(UploadRecord.tournament_id.in_(list(tournament_ids)))
+    query.delete(synchronize_session=False)
@@ -0,0 +1,82 @@
+"""比較 ORM 物件加 to_dict 與欄位投影序列化每 1,000 行所需的 CPU 時間"""
+import os
+import sys
+import time
+from datetime import date
+
+# 使用記憶體資料庫，不影響正式資料
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+from app import create_app, db
+from app.models import Score, Tournament
+from app.serializers import score_serializer, tournament_serializer
+
+ROW_COUNTS = (1_000, 10_000)
+
+
+def seed(n):
+    tournament = Tournament(name='benchmark', date=date(2025, 1, 1), location='benchmark')
+    db.session.add(tournament)
+    db.session.commit()
+    db.session.execute(Score.__table__.insert(), [{
+        'tournament_id': tournament.id,
+        'member_number': f'A{i % 999 + 1:03d}',
+        'full_name': f'Player {i}',
+        'chinese_name': f'球員{i}',
+        'rank': i + 1,
+        'gross_score': 70 + i % 40,
+        'previous_handicap': 10.123 + i % 20,
+        'net_score': 68.456 + i % 30,
+        'handicap_change': -0.5,
+        'new_handicap': 9.623 + i % 20,
+        'points': i % 10
+    } for i in range(n)])
+    for i in range(n // 10):
+        db.session.add(Tournament(name=f'T{i}', date=date(2025, 1, 1), location='L'))
+    db.session.commit()
+    return tournament.id
+
+
+def cpu_time(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.process_time()
+        result = func()
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(row_counts):
+    app = create_app()
+    with app.app_context():
+        print(f'{"端點":<12} {"行數":>8} {"to_dict (ms/千行)":>18} {"投影 (ms/千行)":>16} {"加速":>6}')
+        for n in row_counts:
+            db.drop_all()
+            db.create_all()
+            tournament_id = seed(n)
+
+            names = score_serializer.names
+            row_to_dict = score_serializer.compile(names)
+            orm_time, expected = cpu_time(
+                lambda: [s.to_dict() for s in Score.query.filter_by(tournament_id=tournament_id).all()])
+            fast_time, actual = cpu_time(lambda: [row_to_dict(r) for r in db.session.query(
+                *score_serializer.columns(names)).filter(Score.tournament_id == tournament_id).all()])
+            assert expected == actual
+            print(f'{"/scores":<12} {n:>8,} {orm_time / n * 1e6:>18.2f} {fast_time / n * 1e6:>16.2f} '
+                  f'{orm_time / fast_time:>5.1f}x')
+
+            names = tournament_serializer.names
+            row_to_dict = tournament_serializer.compile(names)
+            count = Tournament.query.count()
+            orm_time, expected = cpu_time(lambda: [t.to_dict() for t in Tournament.query.order_by(Tournament.id)])
+            fast_time, actual = cpu_time(lambda: [row_to_dict(r) for r in db.session.query(
+                *tournament_serializer.columns(names)).order_by(Tournament.id).all()])
+            assert expected == actual
+            print(f'{"/tournaments":<12} {count:>8,} {orm_time / count * 1e6:>18.2f} '
+                  f'{fast_time / count * 1e6:>16.2f} {orm_time / fast_time:>5.1f}x')
+
+
+if __name__ == '__main__':
+    run([int(n) for n in sys.argv[1:]] or ROW_COUNTS)
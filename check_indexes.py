@@ -0,0 +1,79 @@
+"""
+以 EXPLAIN 檢查常用查詢是否使用索引（SQLite 與 PostgreSQL）
+使用 DATABASE_URL 指定的資料庫，需先執行 flask db upgrade
+"""
+import sys
+from datetime import date
+from app import create_app, db
+from app.models import Score, Member, MemberVersion, Tournament, YearlyChampion
+
+app = create_app()
+
+
+def hot_queries():
+    """(說明, 查詢, 預期使用的索引)"""
+    return [
+        ('get_scores 依名次分頁',
+         db.session.query(Score.id, Score.rank).filter(Score.tournament_id == 1)
+         .order_by(Score.rank, Score.id).limit(50),
+         'ix_score_tournament_rank'),
+        ('get_scores 依總桿數分頁',
+         db.session.query(Score.id, Score.gross_score).filter(Score.tournament_id == 1, Score.gross_score > 80)
+         .order_by(Score.gross_score, Score.id).limit(50),
+         'ix_score_tournament_gross_score'),
+        ('generate_version_number 最新版本',
+         db.session.query(MemberVersion.version).order_by(MemberVersion.version.desc()).limit(1),
+         'ix_member_version_version'),
+        ('get_members 指定版本',
+         db.session.query(Member.id, MemberVersion.data).join(MemberVersion, Member.id == MemberVersion.member_id)
+         .filter(MemberVersion.version == '202501010001'),
+         'ix_member_version_version'),
+        ('會員的指定版本資料',
+         db.session.query(MemberVersion.id).filter(MemberVersion.member_id == 1,
+                                                   MemberVersion.version == '202501010001'),
+         'ix_member_version_member_id_version'),
+        ('get_dashboard_stats 本年度賽事',
+         db.session.query(Tournament.id).filter(Tournament.date >= date(2025, 1, 1),
+                                                Tournament.date < date(2026, 1, 1))
+         .order_by(Tournament.date.desc()),
+         'ix_tournament_date'),
+        ('get_awards 依賽事名稱',
+         db.session.query(YearlyChampion.id).filter(YearlyChampion.tournament_name == '年度賽')
+         .order_by(YearlyChampion.date.desc()),
+         'ix_yearly_champions_tournament_name_date'),
+        ('get_dashboard_stats 最近冠軍',
+         db.session.query(YearlyChampion.id).order_by(YearlyChampion.date.desc()).limit(5),
+         'ix_yearly_champions_date'),
+    ]
+
+
+def explain(query):
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    if dialect.name == 'sqlite':
+        rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+        return '\n'.join(str(row[-1]) for row in rows)
+    if dialect.name == 'postgresql':
+        # 測試資料量小時規劃器會偏好循序掃描，關閉後才能確認索引可用
+        db.session.execute(db.text('SET LOCAL enable_seqscan = off'))
+        rows = db.session.execute(db.text(f'EXPLAIN {sql}')).fetchall()
+        return '\n'.join(row[0] for row in rows)
+    raise RuntimeError(f'不支援的資料庫: {dialect.name}')
+
+
+def check_indexes():
+    failures = 0
+    with app.app_context():
+        for label, query, index in hot_queries():
+            plan = explain(query)
+            ok = index in plan
+            failures += not ok
+            print(f'[{"OK" if ok else "FAIL"}] {label}: 預期使用 {index}')
+            if not ok:
+                print('    ' + plan.replace('\n', '\n    '))
+        db.session.rollback()
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if check_indexes() else 0)
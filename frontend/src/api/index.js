@@ -20,9 +20,10 @@ export const scoresApi = {
 
 // 報表分析 API
 export const reportsApi = {
-  getTournamentStats: () => axios.get('/reports/tournaments'),
-  getPlayerStats: () => axios.get('/reports/players'),
-  getScoreStats: () => axios.get('/reports/scores'),
+  getTournamentSummary: (tournamentId) => axios.get(`/reports/tournament-summary/${tournamentId}`),
+  getMemberHistory: (memberNumber) => axios.get(`/reports/member-history/${encodeURIComponent(memberNumber)}`),
+  getLeaderboard: (tournamentId, by = 'net') => axios.get(`/reports/leaderboard/${tournamentId}`, { params: { by } }),
+  getHandicapSeries: (params) => axios.get('/reports/handicap-series', { params }),
 };
 
 export default axios;
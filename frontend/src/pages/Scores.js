@@ -443,7 +443,7 @@ function Scores() {
           <Box sx={{ mt: 2 }}>
             <input
               type="file"
-              accept=".xlsx,.xls,.csv"
+              accept=".xlsx,.xls,.csv,.tsv"
               onChange={(e) => setSelectedFile(e.target.files[0])}
             />
           </Box>